@@ -0,0 +1,66 @@
+import os
+import re
+import json
+import logging
+from collections import OrderedDict
+
+from muncher.backup_save import BackupSave
+
+class Archive:
+    def __init__(self, folder, validator, compression=None, cache_size=3):
+        self.folder = folder
+        self.validator = validator
+        self.compression = compression
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._years = None
+        self._logger = logging.getLogger(__name__)
+
+    def _store(self, year, validator):
+        return BackupSave(folder=self.folder, basename=f"{year}.json", validator=validator, num_keep=1, compression=self.compression)
+
+    def years(self) -> list[int]:
+        if self._years is None:
+            if os.path.exists(self.folder):
+                self._years = sorted({int(m.group(1)) for m in (re.fullmatch(r"(\d{4})\.json", f) for f in os.listdir(self.folder)) if m})
+            else:
+                self._years = []
+        return self._years
+
+    def add(self, year: int, data: dict):
+        store = self._store(year, json.loads)
+        if year in self.years():
+            archived = store.load()
+        else:
+            archived = {}
+        for collection in ("participants", "events", "reservations"):
+            merged = {item["uid"]: item for item in archived.get(collection, [])}
+            merged.update((item["uid"], item) for item in data[collection])
+            archived[collection] = list(merged.values())
+        store.save(json.dumps(archived))
+        self._cache.pop(year, None)
+        if year not in self.years():
+            self._years = sorted(self._years + [year])
+        self._logger.info(f"archived {len(data['events'])} events into {year}")
+
+    def verify(self):
+        results = []
+        for year in self.years():
+            results += self._store(year, self.validator).verify()
+        return results
+
+    def load_year(self, year: int):
+        if year in self._cache:
+            self._cache.move_to_end(year)
+            return self._cache[year]
+        if year not in self.years():
+            raise KeyError(year)
+        m = self._store(year, self.validator).load()
+        m.connect()
+        self._cache[year] = m
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return m
+
+    def event_by_date(self, date):
+        return self.load_year(date.year).event_by_date(date)
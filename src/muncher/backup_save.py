@@ -1,14 +1,65 @@
 import os
 import datetime
+import gzip
+import hashlib
+import json
 import logging
+import lzma
+import time
+import zlib
+
+from muncher import metrics
+
+GZIP_MAGIC = b"\x1f\x8b"
+LZMA_MAGIC = b"\xfd7zXZ\x00"
+
+def compress(data, compression=None):
+    if compression is None:
+        return data
+    elif compression == "gzip":
+        return gzip.compress(data, mtime=0)
+    elif compression == "lzma":
+        return lzma.compress(data)
+    else:
+        raise ValueError(f"unknown compression {compression}")
+
+def decompress(data):
+    try:
+        if data.startswith(GZIP_MAGIC):
+            return gzip.decompress(data)
+        elif data.startswith(LZMA_MAGIC):
+            return lzma.decompress(data)
+        else:
+            return data
+    except (OSError, EOFError, zlib.error, lzma.LZMAError) as e:
+        raise ValueError(f"unable to decompress: {e}") from e
+
+RETENTION_TIERS = (
+        ("keep_hourly", lambda t: (t.date(), t.hour)),
+        ("keep_daily", lambda t: t.date()),
+        ("keep_weekly", lambda t: t.isocalendar()[:2]),
+        )
 
 class BackupSave:
-    def __init__(self, folder, basename, validator, max_tries=3, num_keep=5):
+    def __init__(self, folder, basename, validator, max_tries=3, num_keep=5, keep_hourly=0, keep_daily=0, keep_weekly=0, replay=None, journal=False, journal_max_bytes=1024*1024, journal_max_age=3600.0, compression=None):
         self.folder = folder
         self.basename = basename
         self.validator = validator
         self.max_tries = max_tries
         self.num_keep = num_keep
+        self.keep_hourly = keep_hourly
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+        self._manifest = None
+        self.replay = replay
+        self.journal = journal
+        self.journal_max_bytes = journal_max_bytes
+        self.journal_max_age = journal_max_age
+        self.compression = compression
+        self._journal_file = None
+        self._journal_bytes = 0
+        self._journal_started = None
+        self._snapshot_started = False
         self._logger = logging.getLogger(__name__)
         self._ensure_dir(folder)
 
@@ -17,59 +68,293 @@ class BackupSave:
             self._logger.warning(f"directory {dirname} does not exist, creating it")
             os.makedirs(dirname)
 
-    def _save(self, filename, data):
-        self._logger.debug(f"saving to {filename}")
-        with open(filename, "w") as f:
+    def _write_atomic(self, filename, data):
+        tmp_filename = f"{filename}.tmp"
+        with open(tmp_filename, "wb") as f:
             f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+
+    def _sync_dir(self):
+        fd = os.open(self.folder, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _get_checksum_file(self, filename):
+        return f"{filename}.sha256"
+
+    def _save(self, filename, data, checksum=None):
+        self._logger.debug(f"saving to {filename}")
+        if checksum is None:
+            checksum = hashlib.sha256(data).hexdigest()
+        self._write_atomic(filename, data)
+        self._write_atomic(self._get_checksum_file(filename), checksum.encode())
+        self._sync_dir()
+        metrics.bytes_written.inc(len(data), kind="snapshot")
         self._logger.debug(f"saved to {filename}")
+        return checksum
+
+    def _read_checksum(self, filename):
+        try:
+            with open(self._get_checksum_file(filename), "r") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _verify(self, filename, checksum=None):
+        if checksum is None:
+            checksum = self._read_checksum(filename)
+        with open(filename, "rb") as f:
+            data = f.read()
+        if checksum is not None and hashlib.sha256(data).hexdigest() != checksum:
+            raise RuntimeError(f"checksum mismatch for {filename}")
+        return data
 
     def _load(self, filename):
         self._logger.debug(f"loading {filename}")
         try:
-            with open(filename, "r") as f:
-                data = f.read()
+            data = decompress(self._verify(filename))
             result = self.validator(data)
             self._logger.info(f"loaded data from {filename}")
             return result
-        except (RuntimeError, FileNotFoundError) as e:
+        except FileNotFoundError as e:
+            self._logger.warning(f"unable to load from {filename}: {e}")
+            return None
+        except (RuntimeError, ValueError) as e:
             self._logger.warning(f"unable to load from {filename}: {e}")
+            metrics.validation_failures.inc(error=type(e).__name__)
             return None
 
 
-    def _get_timestamp_file(self):
-        return os.path.join(self.folder, f"{self.basename}_{datetime.datetime.now().isoformat()}")
+    def _get_timestamp_file(self, timestamp):
+        return os.path.join(self.folder, f"{self.basename}_{timestamp.isoformat()}")
 
     def _get_current_file(self):
         return os.path.join(self.folder, self.basename)
 
+    def _get_journal_file(self):
+        return os.path.join(self.folder, f"{self.basename}.journal")
+
+    def _get_compacting_journal_file(self):
+        return f"{self._get_journal_file()}.compacting"
+
+    def begin_snapshot(self):
+        if not self.journal:
+            return
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        current = self._get_journal_file()
+        compacting = self._get_compacting_journal_file()
+        if os.path.exists(compacting) and os.path.exists(current):
+            with open(current, "rb") as src, open(compacting, "ab") as dst:
+                dst.write(src.read())
+            os.remove(current)
+        elif os.path.exists(current):
+            os.replace(current, compacting)
+        self._journal_bytes = 0
+        self._journal_started = None
+        self._snapshot_started = True
+
+    def _finish_snapshot(self):
+        compacting = self._get_compacting_journal_file()
+        if os.path.exists(compacting):
+            os.remove(compacting)
+        self._snapshot_started = False
+        self._logger.debug("journal compacted into snapshot")
+
     def save(self, data):
-        timestamp_file = self._get_timestamp_file()
-        self._save(timestamp_file, data)
-        self._load(timestamp_file)
-        self._save(self._get_current_file(), data)
+        if self.journal and not self._snapshot_started:
+            self.begin_snapshot()
+        if isinstance(data, str):
+            data = data.encode()
+        data = compress(data, self.compression)
+        checksum = hashlib.sha256(data).hexdigest()
+        manifest = self._get_manifest()
+        timestamp = datetime.datetime.now()
+        timestamp_file = self._get_timestamp_file(timestamp)
+        if not self._link_duplicate(checksum, timestamp_file):
+            self._save(timestamp_file, data, checksum)
+            self._verify(timestamp_file, checksum)
+        manifest.append((timestamp, timestamp_file, checksum))
+        self._save(self._get_current_file(), data, checksum)
+        if self._snapshot_started:
+            self._finish_snapshot()
         self._cleanup()
 
-    def _get_backup_files_in_order(self):
-        return sorted((f for f in os.listdir(self.folder) if f.startswith(self.basename) and f != self.basename))
+    def _link_duplicate(self, checksum, filename):
+        for _, existing, existing_checksum in reversed(self._get_manifest()):
+            if existing_checksum != checksum:
+                continue
+            tmp_filename = f"{filename}.tmp"
+            try:
+                self._verify(existing, checksum)
+                os.link(existing, tmp_filename)
+                os.replace(tmp_filename, filename)
+                self._write_atomic(self._get_checksum_file(filename), checksum.encode())
+                self._sync_dir()
+            except (RuntimeError, OSError) as e:
+                self._logger.warning(f"unable to reuse identical backup {existing}: {e}")
+                if os.path.exists(tmp_filename):
+                    os.remove(tmp_filename)
+                return False
+            self._logger.debug(f"linked unchanged snapshot {filename} to {existing}")
+            return True
+        return False
+
+    def append(self, record):
+        if self._journal_file is None:
+            self._journal_file = open(self._get_journal_file(), "a")
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        self._journal_file.write(line)
+        self._journal_file.flush()
+        self._journal_bytes += len(line)
+        metrics.bytes_written.inc(len(line), kind="journal")
+        if self._journal_started is None:
+            self._journal_started = time.monotonic()
+
+    def needs_snapshot(self):
+        if self._journal_started is None:
+            return False
+        return self._journal_bytes >= self.journal_max_bytes or time.monotonic() - self._journal_started >= self.journal_max_age
+
+    def _read_journal(self):
+        records = self._read_journal_file(self._get_compacting_journal_file())
+        records += self._read_journal_file(self._get_journal_file())
+        if records:
+            self._journal_started = time.monotonic()
+        return records
+
+    def _parse_journal(self, data):
+        records = []
+        offset = 0
+        while offset < len(data):
+            end = data.find(b"\n", offset)
+            if end < 0:
+                break
+            try:
+                records.append(json.loads(data[offset:end]))
+            except ValueError:
+                break
+            offset = end + 1
+        return records, offset
+
+    def _read_journal_file(self, filename):
+        try:
+            with open(filename, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        records, offset = self._parse_journal(data)
+        if offset < len(data):
+            self._logger.warning(f"dropping {len(data) - offset} bytes of torn journal records from {filename}")
+            with open(filename, "r+b") as f:
+                f.truncate(offset)
+        self._journal_bytes += offset
+        self._logger.info(f"read {len(records)} journal records from {filename}")
+        return records
+
+    def _replay(self, data):
+        if not self.journal or self.replay is None:
+            return data
+        return self.replay(data, self._read_journal())
+
+    def _scan_backups(self):
+        prefix = f"{self.basename}_"
+        manifest = []
+        for f in os.listdir(self.folder):
+            if not f.startswith(prefix) or f.endswith((".sha256", ".tmp")):
+                continue
+            try:
+                timestamp = datetime.datetime.fromisoformat(f[len(prefix):])
+            except ValueError:
+                continue
+            filename = os.path.join(self.folder, f)
+            manifest.append((timestamp, filename, self._read_checksum(filename)))
+        return sorted(manifest)
+
+    def _get_manifest(self):
+        if self._manifest is None:
+            self._manifest = self._scan_backups()
+        return self._manifest
+
+    def _retained(self, manifest):
+        keep = {filename for _, filename, _ in manifest[-self.num_keep:]} if self.num_keep > 0 else set()
+        for tier, bucket in RETENTION_TIERS:
+            count = getattr(self, tier)
+            buckets = set()
+            for timestamp, filename, _ in reversed(manifest):
+                if len(buckets) >= count:
+                    break
+                key = bucket(timestamp)
+                if key not in buckets:
+                    buckets.add(key)
+                    keep.add(filename)
+        return keep
 
     def _cleanup(self):
-        files = self._get_backup_files_in_order()
-        for f in files[:-self.num_keep]:
-            self._logger.debug(f"deleting {f}")
-            os.remove(os.path.join(self.folder, f))
+        manifest = self._get_manifest()
+        keep = self._retained(manifest)
+        for _, filename, _ in manifest:
+            if filename in keep:
+                continue
+            self._logger.debug(f"deleting {filename}")
+            os.remove(filename)
+            if os.path.exists(self._get_checksum_file(filename)):
+                os.remove(self._get_checksum_file(filename))
+        self._manifest = [entry for entry in manifest if entry[1] in keep]
 
 
+    def verify(self):
+        results = []
+        checked = {}
+        filenames = [self._get_current_file()] + [filename for _, filename, _ in reversed(self._get_manifest())]
+        for filename in filenames:
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            key = (stat.st_dev, stat.st_ino)
+            if key not in checked:
+                try:
+                    self.validator(decompress(self._verify(filename)))
+                    checked[key] = None
+                except (RuntimeError, ValueError) as e:
+                    checked[key] = f"{type(e).__name__}: {e}"
+            results.append((filename, checked[key]))
+        for filename in (self._get_compacting_journal_file(), self._get_journal_file()):
+            try:
+                with open(filename, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            _, offset = self._parse_journal(data)
+            results.append((filename, None if offset == len(data) else f"{len(data) - offset} bytes of torn journal records"))
+        return results
+
     def load(self):
         current = self._load(self._get_current_file())
         if current is not None:
-            return current
-        files = list(reversed(self._get_backup_files_in_order()))
-        for i in range(min(self.max_tries, len(files))):
-            data = self._load(os.path.join(self.folder, files[i]))
+            return self._replay(current)
+        tried = set()
+        for _, filename, _ in reversed(self._get_manifest()):
+            if len(tried) >= self.max_tries:
+                break
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                continue
+            if (stat.st_dev, stat.st_ino) in tried:
+                continue
+            tried.add((stat.st_dev, stat.st_ino))
+            data = self._load(filename)
             if data is not None:
-                return data
-        else:
-            raise RuntimeError(f"unable to load data from first {self.max_tries} backups, giving up")
+                metrics.backup_fallbacks.inc()
+                return self._replay(data)
+        raise RuntimeError(f"unable to load data from first {self.max_tries} backups, giving up")
 
 
 
@@ -0,0 +1,167 @@
+import argparse
+import csv
+import datetime
+import io
+import itertools
+import json
+import platform
+import random
+import statistics
+import tempfile
+import time
+
+from muncher.backup_save import BackupSave
+from muncher.importers import parse_fl
+from muncher.maintenance import remove_expired
+from muncher.model import Counter, Event, Model, Participant, Reservation
+from muncher.persistence import save
+from muncher.reports import statistics_data, statistics_fields
+
+
+def generate_model(participants: int, events: int, reservations_per_event: int, seed: int = 0) -> Model:
+    rnd = random.Random(seed)
+    m = Model(sources=["PM", "FL"], known_names=["real", "FL"])
+    m.participants = [Participant(names={"real": f"participant {i}", "FL": f"fl_{i}"}, add_default=rnd.random() < 0.05, note=rnd.choice(["", "", "vip"])) for i in range(participants)]
+    regulars = m.participants[:max(1, participants * 9 // 10)]
+    first = datetime.date.today() - datetime.timedelta(weeks=events - 4)
+    for i in range(events):
+        e = Event(date=first + datetime.timedelta(weeks=i))
+        m.events.append(e)
+        for p in rnd.sample(regulars, min(reservations_per_event, len(regulars))):
+            count_max = rnd.choice([1, 1, 1, 2])
+            count = rnd.randint(0, count_max)
+            counter = Counter(count=count, count_max=count_max, showed=rnd.randint(0, count))
+            m.reservations.append(Reservation(event_uid=e.uid, participant_uid=p.uid, source=rnd.choice(m.sources), counter_internal=counter))
+    m.connect()
+    return m
+
+
+def generate_fl_csv(m: Model, rows: int, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["Nickname", "Status"])
+    writer.writeheader()
+    for i in range(rows):
+        if i % 2 == 0 and m.participants:
+            name = rnd.choice(m.participants).names["FL"]
+        else:
+            name = f"new_fl_{i}"
+        writer.writerow({"Nickname": name, "Status": rnd.choice(["Going", "Going", "Interested", "Not going"])})
+    return buffer.getvalue()
+
+
+def measure(func, setup=None, repeat=5):
+    durations = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        if setup is not None:
+            func(arg)
+        else:
+            func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def fresh_copy(data: bytes):
+    def setup():
+        m = Model.model_validate_json(data)
+        m.connect()
+        return m
+    return setup
+
+
+def changed_copy(data: bytes):
+    copies = itertools.count()
+
+    def setup():
+        m = fresh_copy(data)()
+        m.reservations[next(copies) % len(m.reservations)].add_one()
+        return m
+    return setup
+
+
+def run_scale(scale: int, args, folder: str) -> list[dict]:
+    sizes = dict(participants=args.participants * scale, events=args.events * scale, reservations_per_event=args.reservations_per_event)
+    m = generate_model(**sizes, seed=args.seed)
+    data = m.model_dump_json()
+    rnd = random.Random(args.seed)
+    lookups = [(rnd.choice(m.events), rnd.choice(m.participants)) for _ in range(args.lookups)]
+    fl_csv = generate_fl_csv(m, args.fl_rows * scale, seed=args.seed)
+    data_store = BackupSave(folder=folder, basename="data.json", validator=Model.model_validate_json)
+
+    def get_reservations():
+        for e, p in lookups:
+            try:
+                m.get_reservation(e, p)
+            except KeyError:
+                pass
+
+    def events_by_date():
+        for e, _ in lookups:
+            m.event_by_date(e.date)
+
+    def auto_clean(m):
+        m.auto_remove_events = True
+        m.auto_remove_events_after_days = 365
+        m.auto_purge_participants = True
+        remove_expired(m)
+
+    benchmarks = {
+            "validate": lambda: Model.model_validate_json(data),
+            "connect": (lambda m: m.connect(), lambda: Model.model_validate_json(data)),
+            "save": (lambda m: save(m, data_store, force=True), changed_copy(data)),
+            "load": lambda: data_store.load(),
+            "get_reservation": get_reservations,
+            "event_by_date": events_by_date,
+            "parse_fl": (lambda m: parse_fl(m, fl_csv, m.events[-1]), fresh_copy(data)),
+            "purge_participants": (lambda m: m.purge_participants(), fresh_copy(data)),
+            "auto_clean": (auto_clean, fresh_copy(data)),
+            "statistics_data": (lambda m: statistics_data(m, statistics_fields), fresh_copy(data)),
+            }
+    save(m, data_store, force=True)
+
+    results = []
+    for name, benchmark in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        if isinstance(benchmark, tuple):
+            durations = measure(benchmark[0], setup=benchmark[1], repeat=args.repeat)
+        else:
+            durations = measure(benchmark, repeat=args.repeat)
+        result = dict(name=name, scale=scale, **sizes, reservations=len(m.reservations), repeat=args.repeat,
+                      min=min(durations), median=statistics.median(durations), max=max(durations))
+        print(f"{name:20} scale {scale:3} median {result['median']*1000:10.2f} ms")
+        results.append(result)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="benchmark model and storage hot paths on synthetic data")
+    parser.add_argument("--participants", type=int, default=300)
+    parser.add_argument("--events", type=int, default=150)
+    parser.add_argument("--reservations-per-event", type=int, default=40)
+    parser.add_argument("--fl-rows", type=int, default=200, help="rows of the FL CSV at scale 1")
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--scales", type=lambda s: [int(x) for x in s.split(",")], default=[1, 3, 10])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="only run the named benchmarks")
+    parser.add_argument("--output", type=str, default="benchmark-results.json")
+    return parser.parse_args()
+
+
+def main_benchmark():
+    args = parse_args()
+    results = []
+    for scale in args.scales:
+        with tempfile.TemporaryDirectory(prefix="muncher-benchmark-") as folder:
+            results += run_scale(scale, args, folder)
+    meta = {"time": datetime.datetime.now().isoformat(), "python": platform.python_version(), "platform": platform.platform(), "args": vars(args)}
+    with open(args.output, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main_benchmark()
@@ -0,0 +1,178 @@
+import argparse
+import csv
+import datetime
+import logging
+import sys
+from typing import Optional
+
+from muncher.importers import ImportFailed, parse_fl_file
+from muncher.maintenance import auto_clean
+from muncher.model import Event
+from muncher.persistence import add_storage_arguments, load_model, open_archive, open_data_store, open_json_store, open_sqlite_store, save, storage_formats
+from muncher.reports import export_chunks, export_formats, export_kinds, statistics_fields, write_statistics_csv
+from muncher.timeseries import PERIODS
+
+logger = logging.getLogger(__name__)
+
+
+class CommandFailed(RuntimeError):
+    pass
+
+
+def indent_of(storage_format: str) -> Optional[int]:
+    return storage_formats[storage_format][0]
+
+def open_model(args, data_store=None):
+    if data_store is None:
+        data_store = open_data_store(args)
+    try:
+        m = load_model(data_store, indent_of(args.format), example=False)
+    except RuntimeError as e:
+        raise CommandFailed(f"unable to load data from {args.folder}: {e}") from e
+    return data_store, m
+
+def finish(args, data_store, m):
+    save(m, data_store, indent=indent_of(args.format))
+    if args.storage == "sqlite":
+        data_store.close()
+
+def import_fl_command(args) -> int:
+    data_store, m = open_model(args)
+    try:
+        event = m.event_by_date(args.event)
+    except KeyError:
+        if not args.create_event:
+            raise CommandFailed(f"no event on {args.event}, use --create-event to add it") from None
+        event = Event(date=args.event)
+        if not args.dry_run:
+            m.add_event(event)
+    fl_import = parse_fl_file(m, args.file, event)
+    for label, count in fl_import.summary().items():
+        print(f"{label}: {count}")
+    if not args.dry_run:
+        fl_import.commit()
+        finish(args, data_store, m)
+    return 0
+
+def open_report_model(args):
+    if args.year is None:
+        return open_model(args)[1]
+    try:
+        return open_archive(args).load_year(args.year)
+    except (KeyError, RuntimeError):
+        raise CommandFailed(f"no archive for {args.year}") from None
+
+def statistics_command(args) -> int:
+    m = open_report_model(args)
+    if args.output is None:
+        write_statistics_csv(sys.stdout, m, statistics_fields, args.start, args.end, args.period)
+    else:
+        with open(args.output, "w", newline="") as f:
+            write_statistics_csv(f, m, statistics_fields, args.start, args.end, args.period)
+    return 0
+
+def export_command(args) -> int:
+    m = open_report_model(args)
+    chunks = export_chunks(m, args.kind, args.output_format, args.start, args.end)
+    if args.output is None:
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.output, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+    return 0
+
+def auto_clean_command(args) -> int:
+    data_store, m = open_model(args)
+    events, participants = len(m.events), len(m.participants)
+    auto_clean(m, open_archive(args))
+    print(f"removed {events - len(m.events)} events and {participants - len(m.participants)} participants")
+    finish(args, data_store, m)
+    return 0
+
+def verify_command(args) -> int:
+    data_store = open_sqlite_store(args.folder, migrate=False) if args.storage == "sqlite" else open_json_store(args)
+    results = data_store.verify() + open_archive(args).verify()
+    if not results:
+        raise CommandFailed(f"no data found in {args.folder}")
+    for filename, error in results:
+        print(f"ok      {filename}" if error is None else f"FAILED  {filename}: {error}")
+    return 1 if any(error is not None for _, error in results) else 0
+
+def convert_command(args) -> int:
+    to_storage = args.to_storage or args.storage
+    to_format = args.to_format or args.format
+    if args.storage == to_storage == "sqlite":
+        raise CommandFailed("the data is already stored in sqlite")
+    source = open_sqlite_store(args.folder, migrate=False) if args.storage == "sqlite" else open_json_store(args, journal=True)
+    _, m = open_model(args, source)
+    if to_storage == "sqlite":
+        target = open_sqlite_store(args.folder, migrate=False)
+        if not target.is_empty() and not args.force:
+            raise CommandFailed(f"{target.filename} already contains data, use --force to replace it")
+    else:
+        target = open_json_store(argparse.Namespace(**{**vars(args), "format": to_format}), journal=True)
+    save(m, target, force=True, indent=indent_of(to_format))
+    print(f"converted {args.storage} data in {args.folder} to {to_storage} ({to_format})")
+    return 0
+
+
+def parse_args(argv: Optional[list[str]] = None):
+    common = argparse.ArgumentParser(add_help=False)
+    add_storage_arguments(common)
+    common.add_argument("-v", "--verbose", action="store_true")
+    parser = argparse.ArgumentParser(description="batch operations on the muncher data folder without starting the web UI. "
+                                     "With json storage the web UI must not run at the same time, with sqlite storage changes reach running workers through the shared store.")
+    commands = parser.add_subparsers(required=True, metavar="command")
+
+    import_fl = commands.add_parser("import-fl", parents=[common], help="import an FL export (csv) into an event")
+    import_fl.add_argument("file")
+    import_fl.add_argument("--event", type=datetime.date.fromisoformat, required=True, help="date of the event, YYYY-MM-DD")
+    import_fl.add_argument("--create-event", action="store_true", help="add the event if it does not exist yet")
+    import_fl.add_argument("--dry-run", action="store_true", help="only print what would be imported")
+    import_fl.set_defaults(command=import_fl_command)
+
+    statistics = commands.add_parser("statistics", parents=[common], help="write the statistics as csv")
+    statistics.add_argument("--start", type=datetime.date.fromisoformat, default=None, help="YYYY-MM-DD")
+    statistics.add_argument("--end", type=datetime.date.fromisoformat, default=None, help="YYYY-MM-DD")
+    statistics.add_argument("--period", choices=PERIODS, default="event")
+    statistics.add_argument("--year", type=int, default=None, help="use the archive of this year")
+    statistics.add_argument("--output", "-o", default=None, help="file to write, default stdout")
+    statistics.set_defaults(command=statistics_command)
+
+    export = commands.add_parser("export", parents=[common], help="write attendance, per-event statistics or participant histories as csv or ndjson")
+    export.add_argument("kind", choices=export_kinds.keys())
+    export.add_argument("--output-format", choices=export_formats.keys(), default="csv")
+    export.add_argument("--start", type=datetime.date.fromisoformat, default=None, help="first event date to include, YYYY-MM-DD")
+    export.add_argument("--end", type=datetime.date.fromisoformat, default=None, help="last event date to include, YYYY-MM-DD")
+    export.add_argument("--year", type=int, default=None, help="use the archive of this year")
+    export.add_argument("--output", "-o", default=None, help="file to write, default stdout")
+    export.set_defaults(command=export_command)
+
+    clean = commands.add_parser("auto-clean", parents=[common], help="archive, remove and purge according to the auto-clean settings")
+    clean.set_defaults(command=auto_clean_command)
+
+    verify = commands.add_parser("verify", parents=[common], help="check checksums and contents of the data file, its backups, journal and archives")
+    verify.set_defaults(command=verify_command)
+
+    convert = commands.add_parser("convert", parents=[common], help="rewrite the data in another storage or format")
+    convert.add_argument("--to-storage", choices=["json", "sqlite"], default=None)
+    convert.add_argument("--to-format", choices=storage_formats.keys(), default=None)
+    convert.add_argument("--force", action="store_true", help="replace data already present in the target sqlite file")
+    convert.set_defaults(command=convert_command)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    try:
+        return args.command(args)
+    except (CommandFailed, ImportFailed, csv.Error, UnicodeDecodeError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
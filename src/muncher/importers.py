@@ -0,0 +1,122 @@
+import asyncio
+import codecs
+import csv
+import io
+
+from muncher.model import Event, Model, Participant, Reservation
+
+
+class ImportFailed(RuntimeError):
+    pass
+
+def import_auto(data):
+    raise ImportFailed("automatic import not implemented yet")
+
+
+fl_columns = ("Nickname", "Status")
+
+class FlImport:
+    def __init__(self, m: Model, event: Event):
+        self.model = m
+        self.event = event
+        self.rows = []
+        self.new_participants = []
+        self.new_reservations = []
+        self._fieldnames = None
+        self._pending = {}
+        self._reserved = {r.participant_uid for r in event.reservations}
+
+    def feed(self, lines):
+        reader = csv.reader(lines)
+        if self._fieldnames is None:
+            self._fieldnames = next(reader, None)
+            if self._fieldnames is None:
+                return
+            missing = [c for c in fl_columns if c not in self._fieldnames]
+            if missing:
+                raise ImportFailed(f"missing columns {', '.join(missing)}")
+        for values in reader:
+            if values:
+                self.add_row(dict(zip(self._fieldnames, values)))
+
+    def add_row(self, row: dict):
+        status = row.get("Status")
+        if status not in ("Going", "Interested"):
+            return
+        name = row.get("Nickname") or ""
+        p = self._pending.get(name)
+        new_participant = False
+        if p is None:
+            try:
+                p = self.model.get_participant_by_name(name, name_source="FL")
+            except KeyError:
+                p = Participant(names={"FL": name})
+                self._pending[name] = p
+                self.new_participants.append(p)
+                new_participant = True
+
+        new_reservation = p.uid not in self._reserved
+        if new_reservation:
+            r = Reservation(event_uid=self.event.uid, participant_uid=p.uid, source="FL-import")
+            r.link(self.event, p)
+            if status != "Going":
+                if r.counter.can_cancel():
+                    r.cancel_one()
+                if not r.note:
+                    r.note = "maybe"
+            self._reserved.add(p.uid)
+            self.new_reservations.append(r)
+        self.rows.append({"uid": str(len(self.rows)), "name": name, "participant": "new" if new_participant else "existing",
+                          "reservation": "new" if new_reservation else "existing", "status": "going" if status == "Going" else "maybe"})
+
+    def summary(self) -> dict:
+        return {
+                "rows": len(self.rows),
+                "new participants": len(self.new_participants),
+                "existing participants": sum(1 for row in self.rows if row["participant"] == "existing"),
+                "new reservations": len(self.new_reservations),
+                "already reserved": sum(1 for row in self.rows if row["reservation"] == "existing"),
+                "maybe": sum(1 for row in self.rows if row["status"] == "maybe"),
+                }
+
+    def commit(self):
+        self.model.bulk_add(self.new_participants, self.new_reservations)
+
+
+def parse_fl(m: Model, data: str, event: Event) -> FlImport:
+    fl_import = FlImport(m, event)
+    fl_import.feed(io.StringIO(data))
+    return fl_import
+
+def parse_fl_file(m: Model, filename: str, event: Event) -> FlImport:
+    fl_import = FlImport(m, event)
+    with open(filename, "r", encoding="utf-8-sig", newline="") as f:
+        fl_import.feed(f)
+    return fl_import
+
+async def read_csv_batches(file, batch_size: int = 1000):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    batch = []
+    tail = ""
+    in_quotes = False
+    async for chunk in file.iterate():
+        parts = (tail + decoder.decode(chunk)).split("\n")
+        tail = parts.pop()
+        for part in parts:
+            batch.append(part + "\n")
+            in_quotes ^= part.count('"') % 2 == 1
+            if len(batch) >= batch_size and not in_quotes:
+                yield batch
+                batch = []
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        batch.append(tail)
+    if batch:
+        yield batch
+
+async def parse_fl_upload(m: Model, file, event: Event) -> FlImport:
+    fl_import = FlImport(m, event)
+    async for batch in read_csv_batches(file):
+        fl_import.feed(batch)
+        await asyncio.sleep(0)
+    return fl_import
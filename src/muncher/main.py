@@ -1,238 +1,122 @@
-import enum
 import datetime
 import argparse
+import asyncio
 import csv
-from typing import Optional
-from uuid import UUID, uuid4
-import json
+from typing import Callable, Optional
 from contextlib import contextmanager
-import io
+from uuid import UUID
+import logging
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urlencode
+
+from pydantic import BaseModel
+import pydantic_core
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from nicegui import Client, app, run, ui
+
+from muncher import importers, metrics, persistence
+from muncher.backup_save import decompress
+from muncher.importers import FlImport, ImportFailed
+from muncher.maintenance import archive_batches, archive_cutoff, remove_events, remove_expired
+from muncher.model import Event, Model, Participant, Reservation
+from muncher.persistence import add_storage_arguments, journal_for, open_archive, open_data_store, open_sqlite_store, storage_formats, write_snapshot
+from muncher.profiling import profiled, profiler
+from muncher.reports import export_chunks, export_formats, export_kinds, last_past_date, statistics_data, statistics_fields, statistics_rows, statistics_totals
+from muncher.sqlite_store import ResyncRequired
+from muncher.timeseries import PERIODS, downsample
+
+logger = logging.getLogger(__name__)
 
-from pydantic import BaseModel, Field, computed_field
-from nicegui import app, ui
-
-from muncher.backup_save import BackupSave
-
-def make_updateable_prop(internal_name: str, T):
-    def setx(self, value: T):
-        setattr(self, internal_name, value)
-        self.on_updated()
-
-    def getx(self) -> T:
-        return getattr(self, internal_name)
-
-    return computed_field(property(fget=getx, fset=setx))
-
-
-class Test(BaseModel):
-    internal_value: bool = Field(default=False, exclude=True)
-
-    foo = make_updateable_prop("internal_value", bool)
-
-    def on_updated(self):
-        print("called on_updated")
-
-
-class Participant(BaseModel):
-    uid: UUID = Field(default_factory=uuid4)
-    names: dict[str, str]
-    add_default: bool = False
-    note: str = ""
-
-    reservations: "Reservation" = Field(default_factory=list, exclude=True)
-
-    def all_names(self) -> str:
-        return "/".join((n for n in self.names.values() if n))
-
-class Event(BaseModel):
-    uid: UUID = Field(default_factory=uuid4)
-    date: datetime.date
-    
-    reservations: "Reservation" = Field(default_factory=list, exclude=True)
-
-    statistics: dict = Field(default_factory=lambda: {"total": 0, "expected": 0, "cancelled": 0, "shows": 0, "noshows": 0}, exclude=True)
-
-    def calculate_statistics(self) -> dict:
-        total = sum((r.counter.count_max for r in self.reservations))
-        expected = sum((r.counter.count for r in self.reservations))
-        shows = sum((r.counter.showed for r in self.reservations))
-        noshows = expected - shows
-        cancelled = total - expected
-
-        self.statistics.update({"total": total, "expected": expected, "cancelled": cancelled, "shows": shows, "noshows": noshows})
-
-
-class Counter(BaseModel):
-    count: int = 1
-    count_max: int = 1
-    showed: int = 0
-
-    def can_cancel(self) -> bool:
-        return self.count > 0
-
-    def can_add_showed(self):
-        return self.showed < self.count
-
-    def can_remove_showed(self):
-        return self.showed > 0
-
-
-class Reservation(BaseModel):
-    uid: UUID = Field(default_factory=uuid4)
-    added_time: datetime.datetime = Field(default_factory=datetime.datetime.now)
-    source: Optional[str]
-
-    counter_internal: Counter = Field(default_factory=Counter)
-    counter = make_updateable_prop("counter_internal", Counter)
-
-    """
-    count_internal: int = 1
-    count_max_internal: int = 1
-    showed_internal: int = 0
-
-    count = make_updateable_prop("count_internal", int)
-    count_max = make_updateable_prop("count_max_internal", int)
-    showed = make_updateable_prop("showed_internal", int)
-    """
-
-
-    def on_updated(self):
-        self.event.calculate_statistics()
-
-    def add_one(self):
-        self.counter = self.counter.model_copy(update=dict(count=self.counter.count+1, count_max=max(self.counter.count+1, self.counter.count_max)))
-        print(self.counter)
-
-    def cancel_one(self):
-        if self.counter.can_cancel():
-            self.counter = self.counter.model_copy(update=dict(count=self.counter.count-1, showed=min(self.counter.count-1, self.counter.showed)))
-
-    def add_showed(self):
-        if self.counter.can_add_showed():
-            self.counter = self.counter.model_copy(update=dict(showed=self.counter.showed+1))
-
-    def remove_showed(self):
-        if self.counter.can_remove_showed():
-            self.counter = self.counter.model_copy(update=dict(showed=self.counter.showed-1))
-
-    note: str = ""
-
-    event_uid: UUID
-    participant_uid: UUID
-
-    event: Optional[Event] = Field(exclude=True, default=None)
-    participant: Optional[Participant] = Field(exclude=True, default=None)
-    
-    @staticmethod
-    def make(event: Event, participant: Participant, source: str="TODO", **kwargs):
-        r = Reservation(event_uid = event.uid, participant_uid=participant.uid, event=event, participant=participant, source=source, **kwargs)
-        event.reservations.append(r)
-        participant.reservations.append(r)
-        return r
-
-    def connect(self):
-        self.event.reservations.append(self)
-        self.participant.reservations.append(self)
-
-class Model(BaseModel):
-    sources: list[str] = list()
-    known_names: list[str] = list()
-    participants: list[Participant] = list()
-    events: list[Event] = list()
-    reservations: list[Reservation] = list()
-
-    auto_purge_participants: bool = False
-    auto_remove_events: bool = False
-    auto_remove_events_after_days: int = 365
+model = Model()
+data_store = None
+saver = None
+archive = None
 
-    def object_by_uid(self, objects, uid: UUID):
-        for o in objects:
-            if o.uid == uid:
-                return o
-        else:
-            raise KeyError(uid)
-
-    def event_by_uid(self, uid: UUID) -> Event:
-        return self.object_by_uid(self.events, uid)
-
-    def participant_by_uid(self, uid: UUID) -> Participant:
-        return self.object_by_uid(self.participants, uid)
-
-    def reservation_by_uid(self, uid: UUID) -> Reservation:
-        return self.object_by_uid(self.reservations, uid)
-    
-    def event_by_date(self, date: datetime.date|str):
-        if isinstance(date, str):
-            date = datetime.date.fromisoformat(date)
-        for e in self.events:
-            if e.date == date:
-                return e
-        else:
-            raise KeyError(date)
+snapshot_indent = 2
 
-    def get_reservation(self, event: Event, participant: Participant):
-        for r in self.reservations:
-            if r.event == event and r.participant == participant:
-                return r
-        else:
-            raise KeyError()
+def load(data_store):
+    global model
+    model.set_journal(None)
+    model = persistence.load_model(data_store, snapshot_indent)
 
-    def get_participant_by_name(self, name: str, name_source: str) -> Participant:
-        for p in self.participants:
-            if name_source in p.names.keys() and p.names[name_source] == name:
-                return p
+def sync_changes():
+    if not persistence.resync_pending:
+        try:
+            records = data_store.changes_since()
+        except ResyncRequired as e:
+            logger.info(f"reloading from the shared store: {e}")
+            persistence.resync_pending = True
         else:
-            raise KeyError(name)
+            if records:
+                model.apply_remote(records)
+            return
+    persistence.resync_pending = False
+    load(data_store)
+    reload_clients()
 
-    def bulk_add(self, participants: list[Participant], reservations: list[Reservation]):
-        self.participants += participants
-        self.reservations += reservations
-        for reservation in reservations:
-            reservation.connect()
+def reload_clients(skip: Optional[Client] = None):
+    for client in list(Client.instances.values()):
+        if client is not skip and client.has_socket_connection:
+            with client:
+                ui.navigate.reload()
 
-    def remove_event(self, event: Event):
-        self.events.remove(event)
-        self.reservations = [r for r in self.reservations if r.event != event]
+def prepare_save(data_store, force=False) -> Optional[tuple[Model, int, dict]]:
+    return persistence.prepare_save(model, data_store, force)
 
-    def purge_participants(self):
-        self.participants = [p for p in self.participants if len(p.reservations) > 0]
+def save(data_store, force=False) -> bool:
+    return persistence.save(model, data_store, force, snapshot_indent)
 
 
-model = Model()
+class AsyncSave:
+    def __init__(self, data_store):
+        self.data_store = data_store
+        self.last_error = None
+        self._lock = asyncio.Lock()
 
-def load(data_store):
-    global model
-    try:
-        model = data_store.load()
-    except RuntimeError:
-        print("unable to load json")
-        model = Model()
-        add_example_data()
-
-    connect()
-
-def add_example_data():
-    model.sources = ["PM", "FL"]
-    model.known_names = ["real", "FL"]
-    e = Event(date="2025-01-01")
-    model.events.append(e)
-    p = Participant(names={"real": "Kurt", "FL": "somebody"})
-    model.participants.append(p)
-    model.participants.append(Participant(names={"real": "Max", "FL": "whatever"}))
-    r = Reservation(event_uid=e.uid, participant_uid=p.uid, source="FL")
-    model.reservations.append(r)
-
-def connect():
-    for reservation in model.reservations:
-        reservation.event = model.event_by_uid(reservation.event_uid)
-        reservation.participant = model.participant_by_uid(reservation.participant_uid)
-        reservation.connect()
-    for event in model.events:
-        event.calculate_statistics()
-
-
-def save(data_store):
-    data_store.save(model.model_dump_json(indent=2))
+    async def save(self, force=False) -> bool:
+        async with self._lock:
+            prepared = prepare_save(self.data_store, force)
+            if prepared is None:
+                return False
+            m, generation, snapshot = prepared
+            try:
+                if not await run.io_bound(write_snapshot, self.data_store, snapshot, snapshot_indent):
+                    raise RuntimeError("the snapshot was not written because the app is stopping")
+            except (Exception, asyncio.CancelledError) as e:
+                self.last_error = e
+                logger.exception("saving failed, changes are kept for the next attempt")
+                return False
+            self.last_error = None
+            m.mark_saved(generation)
+            return True
+
+
+class DebouncedSave:
+    def __init__(self, saver: AsyncSave, delay: float = 2.0, max_delay: float = 30.0):
+        self.saver = saver
+        self.delay = delay
+        self.max_delay = max_delay
+        self._seen_generation = None
+        self._changed_at = None
+        self._dirty_since = None
+
+    async def tick(self):
+        if not model.is_dirty():
+            self._dirty_since = None
+            return
+        now = time.monotonic()
+        if model.generation() != self._seen_generation:
+            self._seen_generation = model.generation()
+            self._changed_at = now
+        if self._dirty_since is None:
+            self._dirty_since = now
+        if now - self._changed_at >= self.delay or now - self._dirty_since >= self.max_delay:
+            if await self.saver.save():
+                self._dirty_since = None
 
 statistics_colors = {
         "total": "blue",
@@ -242,9 +126,39 @@ statistics_colors = {
         "cancelled": "lightgrey",
         }
 
+def on_model_change(obj: BaseModel, element: ui.element, listener: Callable[[], None]):
+    m = obj if isinstance(obj, Model) else obj._model
+    if m is None:
+        return
+
+    def update():
+        if element.is_deleted:
+            m.unsubscribe(obj, update)
+        else:
+            listener()
+
+    m.subscribe(obj, update)
+    element.client.on_delete(lambda: m.unsubscribe(obj, update))
+
+def watch(obj: BaseModel, element: ui.element, update: Callable[[], None]):
+    update()
+    on_model_change(obj, element, update)
+    return element
+
+def watch_value(element: ui.element, obj: BaseModel, name: str):
+    def on_change(e):
+        if getattr(obj, name) != e.value:
+            setattr(obj, name, e.value)
+
+    watch(obj, element, lambda: element.set_value(getattr(obj, name)))
+    element.on_value_change(on_change)
+    return element
+
 def event_statistics(event: Event):
     def make_element(icon, data_field):
-        ui.button(icon=icon, color=statistics_colors[data_field]).bind_text(event.statistics, data_field).set_enabled(False)
+        button = ui.button(icon=icon, color=statistics_colors[data_field])
+        button.set_enabled(False)
+        watch(event, button, lambda: button.set_text(str(event.statistics[data_field])))
         #ui.chip(icon=icon, color=color).bind_text(event.statistics, data_field)
 
     with ui.row():
@@ -255,9 +169,34 @@ def event_statistics(event: Event):
 
 plus_minus_props = "size=s padding=0"
 
+def reservation_counter(r: Reservation):
+    with ui.row(wrap=False):
+        count = ui.label()
+        with ui.button_group().props("rounded"):
+            ui.button(icon="add", on_click=r.add_one).props(plus_minus_props)
+            cancel = ui.button(icon="remove", on_click=r.cancel_one).props(plus_minus_props)
+    with ui.row(wrap=False):
+        showed = ui.label()
+        with ui.button_group().props("rounded"):
+            add_showed = ui.button(icon="add", on_click=r.add_showed).props(plus_minus_props)
+            remove_showed = ui.button(icon="remove", on_click=r.remove_showed).props(plus_minus_props)
+
+    def update():
+        c = r.counter
+        count.set_text(str(c.count))
+        cancel.set_enabled(c.can_cancel())
+        showed.set_text(str(c.showed))
+        add_showed.set_enabled(c.can_add_showed())
+        remove_showed.set_enabled(c.can_remove_showed())
+
+    watch(r, count, update)
+
 
 @ui.refreshable
-def reservation_list(event: Event):
+def reservation_list(event: Event, editable: bool = True):
+    if editable and model.paged_tables:
+        reservation_table(event)
+        return
     with ui.grid(columns="2fr 100px 100px 100px 1fr 1fr").classes("gap-0 w-full"):
         ui.label("name") 
         ui.label("count")
@@ -268,35 +207,137 @@ def reservation_list(event: Event):
         for r in event.reservations:
             participant = r.participant
             ui.label(participant.all_names())
-            with ui.row(wrap=False):
-                ui.label().bind_text_from(r, "counter", backward=lambda c: c.count)
-                with ui.button_group().props("rounded"):
-                    ui.button(icon="add", on_click=r.add_one).props(plus_minus_props)
-                    ui.button(icon="remove", on_click=r.cancel_one).bind_enabled_from(r, "counter", backward=Counter.can_cancel).props(plus_minus_props)
-            with ui.row(wrap=False):
-                ui.label().bind_text_from(r, "counter", backward=lambda c: c.showed)
-                with ui.button_group().props("rounded"):
-                    ui.button(icon="add", on_click=r.add_showed).bind_enabled_from(r, "counter", backward=Counter.can_add_showed).props(plus_minus_props)
-                    ui.button(icon="remove", on_click=r.remove_showed).bind_enabled_from(r, "counter", backward=Counter.can_remove_showed).props(plus_minus_props)
+            if not editable:
+                ui.label(str(r.counter.count))
+                ui.label(str(r.counter.showed))
+                ui.label(r.source)
+                ui.label(r.note)
+                ui.label(participant.note)
+                continue
+            reservation_counter(r)
             ui.label(r.source)
-            ui.input().props("dense").bind_value(r, "note")
-            ui.input().props("dense").bind_value(participant, "note")
+            watch_value(ui.input().props("dense"), r, "note")
+            watch_value(ui.input().props("dense"), participant, "note")
+
+def paged_table(columns: list[dict], fetch: Callable, rows_per_page: int = 25) -> ui.table:
+    table = ui.table(columns=columns, rows=[], row_key="uid", pagination={"page": 1, "rowsPerPage": rows_per_page, "sortBy": None, "descending": False, "rowsNumber": 0})
+    table.props("dense flat")
+    with table.add_slot("top-right"):
+        ui.input(placeholder="filter").props("dense clearable debounce=300").bind_value(table, "filter")
+
+    def request(pagination: dict, filter_: Optional[str]):
+        per_page = pagination["rowsPerPage"]
+        start = (pagination["page"] - 1) * per_page
+        rows, total = fetch((filter_ or "").lower(), pagination.get("sortBy"), pagination.get("descending", False), start, per_page or None)
+        table.rows = rows
+        table.pagination = {**pagination, "rowsNumber": total}
+
+    table.on("request", lambda e: request(e.args["pagination"], e.args.get("filter")))
+    table.reload = lambda: request(table.pagination, table.filter)
+    table.reload()
+    return table
+
+def page_of(items: list, key: Optional[Callable], descending: bool, start: int, count: Optional[int]) -> list:
+    if key is not None:
+        items = sorted(items, key=key, reverse=descending)
+    return items[start:] if count is None else items[start:start + count]
+
+plus_minus_slot = """
+<q-td :props="props">
+    {{{{ props.row.{field} }}}}
+    <q-btn-group rounded>
+        <q-btn icon="add" size="s" padding="0" :disable="!props.row.{can_add}" @click="$parent.$emit('counter', {{uid: props.row.uid, action: '{add}'}})" />
+        <q-btn icon="remove" size="s" padding="0" :disable="!props.row.{can_remove}" @click="$parent.$emit('counter', {{uid: props.row.uid, action: '{remove}'}})" />
+    </q-btn-group>
+</q-td>
+"""
+
+def input_slot(event_name: str) -> str:
+    return f"""
+<q-td :props="props">
+    <q-input dense debounce="500" :model-value="props.value" @update:model-value="value => $parent.$emit('{event_name}', {{uid: props.row.uid, column: props.col.name, value}})" />
+</q-td>
+"""
+
+counter_actions = {"add_one", "cancel_one", "add_showed", "remove_showed"}
+
+def reservation_row(r: Reservation) -> dict:
+    c = r.counter
+    return {"uid": str(r.uid), "name": r.participant.all_names(), "count": c.count, "showed": c.showed, "source": r.source, "note": r.note, "participant_note": r.participant.note,
+            "can_add_one": True, "can_cancel": c.can_cancel(), "can_add_showed": c.can_add_showed(), "can_remove_showed": c.can_remove_showed()}
+
+reservation_sort_keys = {
+        "name": lambda r: r.participant.all_names().lower(),
+        "count": lambda r: r.counter.count,
+        "showed": lambda r: r.counter.showed,
+        "source": lambda r: r.source or "",
+        "note": lambda r: r.note,
+        "participant_note": lambda r: r.participant.note,
+        }
+
+def reservation_table(event: Event):
+    def fetch(filter_, sort_by, descending, start, count):
+        reservations = event.reservations
+        if filter_:
+            reservations = [r for r in reservations if filter_ in r.participant.all_names().lower() or filter_ in r.note.lower() or filter_ in r.participant.note.lower()]
+        page = page_of(reservations, reservation_sort_keys.get(sort_by), descending, start, count)
+        return [reservation_row(r) for r in page], len(reservations)
+
+    columns = [
+            {"name": "name", "label": "name", "field": "name", "sortable": True, "align": "left"},
+            {"name": "count", "label": "count", "field": "count", "sortable": True},
+            {"name": "showed", "label": "shows", "field": "showed", "sortable": True},
+            {"name": "source", "label": "medium", "field": "source", "sortable": True},
+            {"name": "note", "label": "event note", "field": "note", "sortable": True, "align": "left"},
+            {"name": "participant_note", "label": "participant note", "field": "participant_note", "sortable": True, "align": "left"},
+            ]
+    table = paged_table(columns, fetch)
+    table.classes("w-full")
+    table.add_slot("body-cell-count", plus_minus_slot.format(field="count", can_add="can_add_one", add="add_one", can_remove="can_cancel", remove="cancel_one"))
+    table.add_slot("body-cell-showed", plus_minus_slot.format(field="showed", can_add="can_add_showed", add="add_showed", can_remove="can_remove_showed", remove="remove_showed"))
+    table.add_slot("body-cell-note", input_slot("note"))
+    table.add_slot("body-cell-participant_note", input_slot("participant_note"))
+
+    def on_counter(e):
+        if e.args["action"] in counter_actions:
+            getattr(model.reservation_by_uid(UUID(e.args["uid"])), e.args["action"])()
+
+    def on_note(e):
+        model.reservation_by_uid(UUID(e.args["uid"])).note = e.args["value"] or ""
+
+    def on_participant_note(e):
+        model.reservation_by_uid(UUID(e.args["uid"])).participant.note = e.args["value"] or ""
+
+    table.on("counter", on_counter)
+    table.on("note", on_note)
+    table.on("participant_note", on_participant_note)
+    on_model_change(event, table, table.reload)
+
+participant_search_limit = 20
 
 def add_reservation(event: Event):
     with ui.row():
-        event_participants = [r.participant for r in event.reservations]
-        remaining_participants = [p for p in model.participants if not p in event_participants]
-        options = {p.all_names(): p for p in remaining_participants}
-        select = ui.select(options=list(options.keys()), with_input=True)
+        select = ui.select(options={}, with_input=True, label="search participant").props("hide-dropdown-icon")
         source_select = ui.select(options=model.sources, value=model.sources[0])
+        def search(e):
+            reserved = {r.participant_uid for r in event.reservations}
+            options = {str(p.uid): p.all_names() for p in model.search_participants(e.args or "", participant_search_limit, reserved)}
+            if select.value is not None:
+                options.setdefault(select.value, select.options.get(select.value, select.value))
+            select.set_options(options, value=select.value)
+        select.on("input-value", search, throttle=0.1)
+        @profiled("add_reservation")
         def add_participant():
-            p = options[select.value]
+            try:
+                p = model.participant_by_uid(UUID(select.value))
+            except (KeyError, TypeError, ValueError):
+                ui.notify("select a participant first", type="negative")
+                return
             try:
                 model.get_reservation(event=event, participant=p)
             except KeyError:
-                r = Reservation.make(event=event, participant=p, source=source_select.value)
-                model.reservations.append(r)
-                event.calculate_statistics()
+                model.make_reservation(event=event, participant=p, source=source_select.value)
+                select.set_options({}, value=None)
                 reservation_list.refresh()
             else:
                 ui.notify("participant already added", type="negative")
@@ -304,10 +345,10 @@ def add_reservation(event: Event):
         ui.button("Add", on_click=add_participant)
 
 
-def get_event_dates():
-    dates_future = list(sorted((event.date for event in model.events if event.date + datetime.timedelta(days=2) > datetime.date.today())))
-    dates_past = list(reversed(sorted((event.date for event in model.events if event.date + datetime.timedelta(days=2) <= datetime.date.today()))))
-    return dates_future, dates_past
+def get_event_dates(m: Optional[Model] = None):
+    if m is None:
+        m = model
+    return m.split_event_dates(last_past_date())
 
 @contextmanager
 def navbar(title: str):
@@ -322,13 +363,17 @@ def navbar(title: str):
             ui.button(on_click=lambda: ui.navigate.to("/statistics"), icon='bar_chart')
 
             with ui.button(icon="event"):
-                with ui.menu() as menu:
+                menu = ui.menu()
+                def fill_menu():
+                    menu.clear()
                     dates_future, dates_past = get_event_dates()
-                    for date in dates_future:
-                        ui.menu_item(date, lambda date=date: ui.navigate.to(f"/event/{date}"))
-                    ui.separator()
-                    for date in dates_past:
-                        ui.menu_item(date, lambda date=date: ui.navigate.to(f"/event/{date}"))
+                    with menu:
+                        for date in dates_future:
+                            ui.menu_item(date, lambda date=date: ui.navigate.to(f"/event/{date}"))
+                        ui.separator()
+                        for date in dates_past:
+                            ui.menu_item(date, lambda date=date: ui.navigate.to(f"/event/{date}"))
+                menu.on("before-show", fill_menu)
 
 async def wait_confirm(message: str, ok_icon: str, ok_text: str):
     with ui.dialog() as dialog, ui.card():
@@ -347,7 +392,11 @@ def edit_event_dialog(event: Event):
     with ui.dialog() as edit_dialog, ui.card():
         date_element = ui.date(value=event.date.isoformat())
         def save_event():
-            event.date = datetime.date.fromisoformat(date_element.value)
+            try:
+                model.set_event_date(event, datetime.date.fromisoformat(date_element.value))
+            except KeyError:
+                ui.notify("date already has an event", type="negative")
+                return
             edit_dialog.close()
             ui.navigate.to(f"/event/{event.date.isoformat()}")
         async def delete():
@@ -363,11 +412,13 @@ def edit_event_dialog(event: Event):
     return edit_dialog
 
 @ui.page("/event/{date}")
+@profiled("page:event_page")
+@metrics.page_render_seconds.timed(page="event_page")
 def event_page(date: str):
     try:
         event = model.event_by_date(date)
     except KeyError:
-        ui.label("no event on this date")
+        archived_event_page(date)
     else:
         edit_dialog = edit_event_dialog(event)
         with navbar(date):
@@ -378,110 +429,186 @@ def event_page(date: str):
         bulk_import_button(event)
 
 
+def archived_event_page(date: str):
+    try:
+        event = archive.event_by_date(datetime.date.fromisoformat(date))
+    except (KeyError, ValueError, RuntimeError):
+        ui.label("no event on this date")
+        return
+    with navbar(f"{date} (archived)"):
+        pass
+    event_statistics(event)
+    reservation_list(event, editable=False)
+
+
 @ui.page("/newevent")
+@profiled("page:newevent")
 def newevent():
     with navbar("new event"):
         pass
     date = ui.date()
     def create():
         d = date.value
+        e = Event(date=d)
         try:
-            model.event_by_date(d)
-            ui.notify("date already has an event", type="negative")
+            with model.transaction():
+                model.add_event(e)
+                for p in model.participants:
+                    if p.add_default:
+                        model.make_reservation(event=e, participant=p, source="auto")
         except KeyError:
-            e = Event(date=d)
-            model.events.append(e)
-            for p in model.participants:
-                if p.add_default:
-                    model.reservations.append(Reservation.make(event=e, participant=p, source="auto"))
+            ui.notify("date already has an event", type="negative")
+        else:
             ui.navigate.to(f"/event/{d}")
     ui.button("Add", on_click=create)
 
+def participant_row(p: Participant) -> dict:
+    return {"uid": str(p.uid), **{f"name_{i}": p.names.get(name, "") for i, name in enumerate(model.known_names)}, "add_default": p.add_default, "events": len(p.reservations), "note": p.note}
+
+def participant_sort_key(sort_by: Optional[str]) -> Optional[Callable]:
+    if sort_by is None:
+        return None
+    elif sort_by.startswith("name_"):
+        name = model.known_names[int(sort_by.removeprefix("name_"))]
+        return lambda p: p.names.get(name, "").lower()
+    elif sort_by == "events":
+        return lambda p: len(p.reservations)
+    elif sort_by == "note":
+        return lambda p: p.note.lower()
+    elif sort_by == "add_default":
+        return lambda p: p.add_default
+    return None
+
+@ui.refreshable
+def participant_table():
+    def fetch(filter_, sort_by, descending, start, count):
+        participants = model.participants
+        if filter_:
+            participants = [p for p in participants if filter_ in p.all_names().lower() or filter_ in p.note.lower()]
+        page = page_of(participants, participant_sort_key(sort_by), descending, start, count)
+        return [participant_row(p) for p in page], len(participants)
+
+    columns = [{"name": f"name_{i}", "label": name, "field": f"name_{i}", "sortable": True, "align": "left"} for i, name in enumerate(model.known_names)]
+    columns += [
+            {"name": "add_default", "label": "add default", "field": "add_default", "sortable": True},
+            {"name": "events", "label": "num events", "field": "events", "sortable": True},
+            {"name": "note", "label": "note", "field": "note", "sortable": True, "align": "left"},
+            ]
+    table = paged_table(columns, fetch)
+    table.classes("w-full")
+    for i in range(len(model.known_names)):
+        table.add_slot(f"body-cell-name_{i}", input_slot("name"))
+    table.add_slot("body-cell-add_default", """
+<q-td :props="props">
+    <q-checkbox dense :model-value="props.row.add_default" @update:model-value="value => $parent.$emit('add_default', {uid: props.row.uid, value})" />
+</q-td>
+""")
+    table.add_slot("body-cell-note", input_slot("note"))
+
+    def on_name(e):
+        p = model.participant_by_uid(UUID(e.args["uid"]))
+        p.names[model.known_names[int(e.args["column"].removeprefix("name_"))]] = e.args["value"] or ""
+        model.update_participant_names(p)
+
+    def on_add_default(e):
+        model.participant_by_uid(UUID(e.args["uid"])).add_default = bool(e.args["value"])
+        table.reload()
+
+    def on_note(e):
+        model.participant_by_uid(UUID(e.args["uid"])).note = e.args["value"] or ""
+
+    table.on("name", on_name)
+    table.on("add_default", on_add_default)
+    table.on("note", on_note)
+
+def participant_name_input(p: Participant, name: str):
+    def on_change(e):
+        if p.names.get(name, "") != e.value:
+            p.names[name] = e.value
+            model.update_participant_names(p)
+
+    element = ui.input(name)
+    watch(p, element, lambda: element.set_value(p.names.get(name, "")))
+    element.on_value_change(on_change)
+
 @ui.refreshable
 def participant_list():
     for p in model.participants:
         for name in model.known_names:
-            ui.input(name).bind_value(p.names, name)
-        ui.checkbox("add").bind_value(p, "add_default")
+            participant_name_input(p, name)
+        watch_value(ui.checkbox("add"), p, "add_default")
         ui.label(str(len(p.reservations)))
-        ui.input("note").bind_value(p, "note")
+        watch_value(ui.input("note"), p, "note")
 
 
 def add_participant():
     name_inputs = {}
     for name in model.known_names:
         name_inputs[name] = ui.input(name)
+    @profiled("add_participant")
     def save_participant():
         names = {k: v.value for k, v in name_inputs.items()}
         if len([n for n in names.values() if n]) == 0:
             ui.notify("fill out at least one name", type="negative")
         else:
-            p = Participant(names=names)
-            model.participants.append(p)
+            model.add_participant(Participant(names=names))
             for v in name_inputs.values():
                 v.value = ""
             participant_list.refresh()
+            participant_table.refresh()
     ui.button("add", on_click=save_participant)
     ui.label("")
 
-class ImportFailed(RuntimeError):
-    pass
-
-def import_auto(data):
-    raise ImportFailed("automatic import not implemented yet")
-
-
-async def import_fl(data: str, event: Event):
-    new_participants = []
-    new_reservations = []
-    import_names = []
-    buffer = io.StringIO(data)
-    reader = csv.DictReader(buffer)
-
-    with ui.dialog() as confirm_dialog, ui.card():
-        with ui.grid(columns=3):
-            ui.label("name")
-            ui.icon("people")
-            ui.icon("event")
-
-            for row in reader:
-                if row["Status"] not in ("Going", "Interested"):
-                    continue
-                name = row["Nickname"]
-                ui.label(name)
-                try:
-                    p = model.get_participant_by_name(name, name_source="FL")
-                    ui.icon("check", color="grey")
-                except KeyError:
-                    p = Participant(names={"FL": name})
-                    new_participants.append(p)
-                    ui.icon("add_circle", color="green")
-
-                try:
-                    r = model.get_reservation(event=event, participant=p)
-                    ui.icon("check", color="grey")
-                except KeyError:
-                    r = Reservation(event=event, participant=p, event_uid=event.uid, participant_uid=p.uid, source="FL-import")
-                    new_reservations.append(r)
-                    ui.icon("add_circle", color="green")
-                    if row["Status"] != "Going":
-                        if r.counter.can_cancel():
-                            r.cancel_one()
-                        if not r.note:
-                            r.note = "maybe"
+@profiled("import_fl:parse")
+def parse_fl(data: str, event: Event) -> FlImport:
+    return importers.parse_fl(model, data, event)
+
+@profiled("import_fl:upload")
+async def parse_fl_upload(file, event: Event) -> FlImport:
+    return await importers.parse_fl_upload(model, file, event)
+
+def import_table(fl_import: FlImport):
+    def fetch(filter_, sort_by, descending, start, count):
+        rows = fl_import.rows
+        if filter_:
+            rows = [row for row in rows if filter_ in row["name"].lower()]
+        key = None if sort_by is None else lambda row: row[sort_by]
+        return page_of(rows, key, descending, start, count), len(rows)
+
+    columns = [
+            {"name": "name", "label": "name", "field": "name", "sortable": True, "align": "left"},
+            {"name": "participant", "label": "participant", "field": "participant", "sortable": True},
+            {"name": "reservation", "label": "reservation", "field": "reservation", "sortable": True},
+            {"name": "status", "label": "status", "field": "status", "sortable": True},
+            ]
+    return paged_table(columns, fetch, rows_per_page=10)
+
+@profiled("import_fl:commit")
+def commit_import(fl_import: FlImport):
+    fl_import.commit()
+
+async def confirm_import(fl_import: FlImport):
+    with ui.dialog() as confirm_dialog, ui.card().classes("w-full"):
+        with ui.row():
+            for label, count in fl_import.summary().items():
+                ui.chip(f"{label}: {count}")
+        import_table(fl_import).classes("w-full")
         with ui.row():
             ui.button("Import", icon="check", color="green", on_click=lambda: confirm_dialog.submit(True))
             ui.button("Cancel", icon="cancel", color="red", on_click=lambda: confirm_dialog.submit(False))
 
     confirmed = await confirm_dialog
     if confirmed:
-        model.bulk_add(new_participants, new_reservations)
+        commit_import(fl_import)
         ui.navigate.reload()
         ui.notify("Imported")
     else:
         ui.notify("Import canceled", type="negative")
     confirm_dialog.clear()
 
+async def import_fl(data: str, event: Event):
+    await confirm_import(parse_fl(data, event))
+
 
 import_tools = {
         #"auto": import_auto,
@@ -489,6 +616,15 @@ import_tools = {
         }
 
 def bulk_import_button(event: Event):
+    async def upload_fl(e):
+        dialog.close()
+        try:
+            fl_import = await parse_fl_upload(e.file, event)
+        except (ImportFailed, csv.Error, UnicodeDecodeError) as error:
+            ui.notify(f"Import failed: {error}", type="negative")
+            return
+        await confirm_import(fl_import)
+
     with ui.dialog() as dialog, ui.card():
         ui.label("Import")
         with ui.row():
@@ -496,36 +632,52 @@ def bulk_import_button(event: Event):
                 async def func():
                     try:
                         await f(textarea.value, event)
-                    except ImportFailed as e:
+                    except (ImportFailed, csv.Error) as e:
                         ui.notify(f"Import failed: {e}", type="negative")
                     dialog.close()
                 ui.button(f"import ({name})", icon="file_upload", on_click=func)
             ui.button("Cancel", icon="cancel", on_click=dialog.close)
         textarea = ui.textarea(label="import text")
+        ui.upload(label="upload FL export (csv)", on_upload=upload_fl, auto_upload=True, max_files=1).props("accept=.csv")
     ui.button("import", icon="file_upload", on_click=dialog.open)
 
 def purge_participant_button():
+    @profiled("purge")
+    def purge_now():
+        model.purge_participants()
+
     async def purge():
         really_purge = await wait_confirm("Do you really want to purge the participant list?", ok_text="purge", ok_icon="delete")
         if really_purge:
-            model.purge_participants()
+            purge_now()
             participant_list.refresh()
+            participant_table.refresh()
     ui.button("purge participants with no events", icon="delete", color="warning", on_click=purge)
 
 
-def auto_clean_action():
-    if model.auto_remove_events:
-        events_to_remove = [event for event in model.events if (datetime.date.today()-event.date).days > model.auto_remove_events_after_days]
-        for event in events_to_remove:
-            model.remove_event(event)
-    if model.auto_purge_participants:
-        model.purge_participants()
+async def archive_events(before: datetime.date):
+    for year, events, data in archive_batches(model.events_before(before)):
+        await run.io_bound(archive.add, year, data)
+        remove_events(model, events)
+
+async def auto_clean_action():
+    if model.auto_archive_events:
+        await archive_events(archive_cutoff(model))
+    remove_expired(model)
 
 
 @ui.page("/participants")
+@profiled("page:participants")
+@metrics.page_render_seconds.timed(page="participants")
 def participants():
     with navbar("participant list"):
         pass
+    if model.paged_tables:
+        participant_table()
+        with ui.row().classes("items-center"):
+            add_participant()
+        purge_participant_button()
+        return
     with ui.grid(columns=3+len(model.known_names)):
         for name in model.known_names:
             ui.label(name)
@@ -537,19 +689,26 @@ def participants():
         add_participant()
     purge_participant_button()
 
-def restore_backup(event):
-    data = event.content.read()
+async def restore_backup(event):
+    data = await event.file.read()
     global model
     try:
-        new_model = Model.model_validate_json(data)
-    except RuntimeError as e:
+        new_model = Model.model_validate_json(decompress(data))
+    except (RuntimeError, ValueError) as e:
         ui.notify(f"Restoring backup failed: {e}", type="negative")
     else:
+        model.set_journal(None)
         model = new_model
+        model.connect()
+        model.set_journal(journal_for(model, data_store))
+        await saver.save(force=True)
+        reload_clients(skip=ui.context.client)
         ui.notify("backup restored")
         ui.navigate.to("/")
 
 @ui.page("/settings")
+@profiled("page:settings")
+@metrics.page_render_seconds.timed(page="settings")
 def settings():
     with navbar("settings"):
         pass
@@ -568,9 +727,17 @@ def settings():
 
     ui.separator()
 
-    ui.checkbox("auto-purge participants when they have no reservations").bind_value(model, "auto_purge_participants")
-    ui.checkbox("auto-remove events after some time").bind_value(model, "auto_remove_events")
-    ui.number("auto remove after N days", min=1, precision=0).bind_value(model, "auto_remove_events_after_days").bind_enabled(model, "auto_remove_events")
+    watch_value(ui.checkbox("use paged tables for reservations and participants"), model, "paged_tables")
+
+    ui.separator()
+
+    watch_value(ui.checkbox("auto-purge participants when they have no reservations"), model, "auto_purge_participants")
+    watch_value(ui.checkbox("auto-remove events after some time"), model, "auto_remove_events")
+    remove_days = watch_value(ui.number("auto remove after N days", min=1, precision=0), model, "auto_remove_events_after_days")
+    watch(model, remove_days, lambda: remove_days.set_enabled(model.auto_remove_events))
+    watch_value(ui.checkbox("auto-archive events after some time"), model, "auto_archive_events")
+    archive_days = watch_value(ui.number("auto archive after N days", min=1, precision=0), model, "auto_archive_events_after_days")
+    watch(model, archive_days, lambda: archive_days.set_enabled(model.auto_archive_events))
     ui.button("perform auto clean now", icon="delete_sweep", on_click=auto_clean_action)
 
     ui.separator()
@@ -579,49 +746,124 @@ def settings():
         ui.button("download backup", icon="download", on_click=lambda: ui.download("/backup"))
         ui.upload(on_upload=restore_backup, label="restore backup", multiple=False, max_files=1)
 
-@ui.page("/statistics")
-def statistics():
-    with navbar("statistics"):
-        pass
-    fields = ("total", "shows", "noshows", "cancelled")
-    with ui.grid(columns=1+len(fields)):
-        ui.label("date")
-        for f in fields:
-            ui.label(f)
-
-        _, past_events = get_event_dates()
-        data = {f: [] for f in fields}
-        for event_date in past_events:
-            event = model.event_by_date(event_date)
-            ui.label(event_date)
-            for f in fields:
-                ui.label(event.statistics[f])
-                data[f].append(event.statistics[f])
+chart_max_points = 200
 
+def parse_date_param(value: Optional[str]) -> Optional[datetime.date]:
+    return datetime.date.fromisoformat(value) if value else None
 
+@ui.page("/statistics")
+@profiled("page:statistics")
+@metrics.page_render_seconds.timed(page="statistics")
+async def statistics(year: Optional[int] = None, start: Optional[str] = None, end: Optional[str] = None, period: str = "event"):
+    with navbar("statistics" if year is None else f"statistics {year} (archived)"):
+        pass
+    with ui.row():
+        ui.link("current", "/statistics")
+        for archived_year in archive.years():
+            ui.link(str(archived_year), f"/statistics?year={archived_year}")
+    with ui.row().classes("items-center"):
+        start_input = ui.input("from", value=start or "", placeholder="YYYY-MM-DD").props("dense clearable")
+        end_input = ui.input("to", value=end or "", placeholder="YYYY-MM-DD").props("dense clearable")
+        period_select = ui.select(list(PERIODS), value=period if period in PERIODS else "event", label="group by").props("dense")
+        def apply_filter():
+            params = {"year": year, "start": start_input.value, "end": end_input.value, "period": period_select.value}
+            ui.navigate.to(f"/statistics?{urlencode({k: v for k, v in params.items() if v})}")
+        ui.button("apply", icon="filter_alt", on_click=apply_filter)
+    try:
+        start_date, end_date = parse_date_param(start), parse_date_param(end)
+    except ValueError:
+        ui.label("invalid date, use YYYY-MM-DD")
+        return
+    if period not in PERIODS:
+        ui.label(f"unknown grouping {period}")
+        return
+    with ui.row().classes("items-center"):
+        ui.label("export")
+        filters = {k: v for k, v in {"year": year, "start": start, "end": end}.items() if v}
+        for kind in export_kinds:
+            for format in export_formats:
+                ui.link(f"{kind} ({format})", f"/export/{kind}?{urlencode({'format': format, **filters})}")
+    if year is None:
+        m = model
+    else:
+        try:
+            m = await run.io_bound(archive.load_year, year)
+        except (KeyError, RuntimeError):
+            ui.label(f"no archive for {year}")
+            return
+    fields = statistics_fields
+    labels, data = statistics_data(m, fields, start_date, end_date, period)
+    columns = [{"name": "date", "label": "date" if period == "event" else period, "field": "date", "align": "left"}]
+    columns += [{"name": f, "label": f, "field": f} for f in fields]
+    ui.table(columns=columns, rows=statistics_rows(labels, data, statistics_totals(m, fields, start_date, end_date), fields), row_key="date", pagination=25).props("dense flat")
+
+    chart_labels, chart_data = downsample(labels, data, chart_max_points)
     ui.echart({
-        "xAxis": {"type": "category", "data": past_events},
+        "xAxis": {"type": "category", "data": [label.isoformat() for label in chart_labels]},
         "yAxis": {
             "type": "value"
             },
         "series": [
-            {"type": "bar", "stack": "" if f=="total" else "Ad", "name": f, "data": data[f], "color": statistics_colors[f]}
+            {"type": "bar", "stack": "" if f=="total" else "Ad", "name": f, "data": chart_data[f], "color": statistics_colors[f]}
             for f in fields if f!= "total"],
         "legend": {}
         })
-    
+
 @app.get("/backup")
-def backup():
-    dump = model.model_dump()
-    print(dump)
-    return dump
+def backup(request: Request, since: Optional[str] = None):
+    with model.locked():
+        etag = f'"{model.backup_version()}"'
+        headers = {"ETag": etag}
+        if etag in (t.strip() for t in request.headers.get("if-none-match", "").split(",")):
+            return Response(status_code=304, headers=headers)
+        if since is None:
+            data = model.__pydantic_serializer__.to_json(model)
+        else:
+            try:
+                data = pydantic_core.to_json(model.changed_since(since))
+            except KeyError:
+                return Response(f"unknown backup version {since}, fetch a full backup", status_code=409, media_type="text/plain")
+    return Response(data, media_type="application/json", headers=headers)
+
+@app.get("/export/{kind}")
+def export(kind: str, format: str = "csv", start: Optional[str] = None, end: Optional[str] = None, year: Optional[int] = None):
+    if kind not in export_kinds or format not in export_formats:
+        return Response(f"unknown export {kind} as {format}", status_code=404, media_type="text/plain")
+    try:
+        start_date, end_date = parse_date_param(start), parse_date_param(end)
+    except ValueError:
+        return Response("invalid date, use YYYY-MM-DD", status_code=400, media_type="text/plain")
+    if year is None:
+        m = model
+    else:
+        try:
+            m = archive.load_year(year)
+        except (KeyError, RuntimeError):
+            return Response(f"no archive for {year}", status_code=404, media_type="text/plain")
+    chunks = export_chunks(m, kind, format, start_date, end_date)
+    headers = {"Content-Disposition": f'attachment; filename="muncher-{kind}.{format}"'}
+    return StreamingResponse(chunks, media_type=export_formats[format][0], headers=headers)
+
+
+def model_size() -> dict:
+    return {"participants": len(model.participants), "events": len(model.events), "reservations": len(model.reservations)}
+
+@app.get("/metrics")
+def metrics_page():
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+metrics.registry.gauge("muncher_participants", "number of participants", function=lambda: len(model.participants))
+metrics.registry.gauge("muncher_events", "number of events", function=lambda: len(model.events))
+metrics.registry.gauge("muncher_reservations", "number of reservations", function=lambda: len(model.reservations))
+metrics.registry.gauge("muncher_connected_clients", "browser tabs with an open websocket", function=lambda: sum(1 for c in Client.instances.values() if c.has_socket_connection))
 
 
 @ui.page("/")
+@profiled("page:index")
 def index():
-    future_events, _ = get_event_dates()
-    if len(future_events) > 0:
-        ui.navigate.to(f"/event/{future_events[0]}")
+    next_event = model.first_event_after(last_past_date())
+    if next_event is not None:
+        ui.navigate.to(f"/event/{next_event.date}")
     else:
         with navbar("homepage"):
             pass
@@ -630,21 +872,73 @@ def index():
 def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--host", type=str, default=None)
-    parser.add_argument("--folder", type=str, default="data", required=False)
-    return parser.parse_args()
+    parser.add_argument("--save-delay", type=float, default=2.0, help="seconds without changes before saving")
+    parser.add_argument("--save-max-delay", type=float, default=30.0, help="maximum seconds changes may stay unsaved")
+    add_storage_arguments(parser)
+    parser.add_argument("--check-statistics", action="store_true", help="verify incremental statistics against a full recalculation after every change")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=1, help="serve the same data from N processes on consecutive ports starting at --port, requires sqlite storage and a reverse proxy with sticky sessions")
+    parser.add_argument("--worker-index", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--sync-interval", type=float, default=0.5, help="seconds between checks for changes made by other workers")
+    parser.add_argument("--profile-threshold", type=float, default=os.environ.get("MUNCHER_PROFILE_THRESHOLD"), help="log pages, actions, saves and loads slower than this many seconds (env MUNCHER_PROFILE_THRESHOLD)")
+    parser.add_argument("--profile-every", type=int, default=os.environ.get("MUNCHER_PROFILE_EVERY", "0"), help="write a cProfile dump of every N-th call of each operation to FOLDER/profiles (env MUNCHER_PROFILE_EVERY)")
+    args = parser.parse_args()
+    if args.workers > 1 and args.storage != "sqlite":
+        parser.error("--workers requires --storage sqlite")
+    return args
+
+
+def worker_command(args, index: int) -> list[str]:
+    return [sys.executable, "-m", "muncher.main", *sys.argv[1:], "--workers", "1", "--port", str(args.port + index), "--worker-index", str(index)]
+
+def supervise_workers(args):
+    store = open_sqlite_store(args.folder)
+    load(store)
+    store.close()
+    workers = {i: subprocess.Popen(worker_command(args, i)) for i in range(args.workers)}
+    try:
+        while True:
+            time.sleep(1.0)
+            for i, worker in workers.items():
+                if worker.poll() is not None:
+                    logger.warning(f"worker {i} exited with code {worker.returncode}, restarting it")
+                    workers[i] = subprocess.Popen(worker_command(args, i))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers.values():
+            worker.terminate()
+        for worker in workers.values():
+            worker.wait()
 
 
 def main():
+    global data_store, saver, archive, snapshot_indent
     args = parse_args()
-    data_store = BackupSave(folder=args.folder, basename="data.json", validator=Model.model_validate_json)
+    if args.workers > 1:
+        supervise_workers(args)
+        return
+    Event.check_statistics = args.check_statistics
+    profiler.configure(threshold=args.profile_threshold, profile_every=args.profile_every, folder=os.path.join(args.folder, "profiles"), size=model_size)
+    snapshot_indent, _ = storage_formats[args.format]
+    data_store = open_data_store(args)
+    archive = open_archive(args)
     load(data_store)
-    app.on_startup(startup_actions)
-    app.on_shutdown(lambda: save(data_store))
-    ui.run(host=args.host, title="muncher", reload=False)
-
-def startup_actions():
-    ui.timer(10.0, lambda: save(data_store))
-    ui.timer(24*3600.0, auto_clean_action)
+    saver = AsyncSave(data_store)
+    debounced = DebouncedSave(saver, delay=args.save_delay, max_delay=args.save_max_delay)
+    app.on_startup(lambda: startup_actions(debounced, args))
+    app.on_shutdown(save_on_shutdown)
+    ui.run(host=args.host, port=args.port, title="muncher", reload=False)
+
+def save_on_shutdown():
+    save(data_store, force=not data_store.journal)
+
+def startup_actions(debounced: DebouncedSave, args):
+    app.timer(1.0, debounced.tick)
+    if args.storage == "sqlite":
+        app.timer(args.sync_interval, sync_changes)
+    if args.worker_index == 0:
+        app.timer(24*3600.0, auto_clean_action)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,49 @@
+import datetime
+from typing import Optional
+
+from muncher.archive import Archive
+from muncher.model import Event, Model
+
+def archive_cutoff(m: Model, today: Optional[datetime.date] = None) -> datetime.date:
+    return (today or datetime.date.today()) - datetime.timedelta(days=m.auto_archive_events_after_days)
+
+def removal_cutoff(m: Model, today: Optional[datetime.date] = None) -> datetime.date:
+    return (today or datetime.date.today()) - datetime.timedelta(days=m.auto_remove_events_after_days)
+
+def archive_batches(events: list[Event]) -> list[tuple[int, list[Event], dict]]:
+    years = {}
+    for event in events:
+        years.setdefault(event.date.year, []).append(event)
+    batches = []
+    for year, year_events in years.items():
+        reservations = [r for event in year_events for r in event.reservations]
+        participants = {r.participant.uid: r.participant for r in reservations}
+        data = {
+                "events": [e.model_dump(mode="json") for e in year_events],
+                "reservations": [r.model_dump(mode="json") for r in reservations],
+                "participants": [p.model_dump(mode="json") for p in participants.values()],
+                }
+        batches.append((year, year_events, data))
+    return batches
+
+def remove_events(m: Model, events: list[Event]):
+    with m.transaction():
+        for event in events:
+            m.remove_event(event)
+
+def archive_events(m: Model, archive: Archive, before: datetime.date):
+    for year, events, data in archive_batches(m.events_before(before)):
+        archive.add(year, data)
+        remove_events(m, events)
+
+def remove_expired(m: Model, today: Optional[datetime.date] = None):
+    with m.transaction():
+        if m.auto_remove_events:
+            remove_events(m, m.events_before(removal_cutoff(m, today)))
+        if m.auto_purge_participants:
+            m.purge_participants()
+
+def auto_clean(m: Model, archive: Archive, today: Optional[datetime.date] = None):
+    if m.auto_archive_events:
+        archive_events(m, archive, archive_cutoff(m, today))
+    remove_expired(m, today)
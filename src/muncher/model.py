@@ -0,0 +1,727 @@
+import bisect
+import datetime
+import logging
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, ClassVar, Container, Optional
+from uuid import UUID, uuid4
+
+from pydantic import BaseModel, Field
+from pydantic_core import core_schema
+
+from muncher.profiling import profiled
+from muncher.search import SearchIndex
+from muncher.timeseries import StatisticsSeries
+
+logger = logging.getLogger(__name__)
+
+class Tracked(BaseModel):
+    __slots__ = ("_model",)
+
+    version: int = Field(default=0, exclude=True)
+
+    def model_post_init(self, context):
+        object.__setattr__(self, "_model", None)
+
+    def attach(self, model: Optional["Model"]):
+        object.__setattr__(self, "_model", model)
+
+    def __setattr__(self, name, value):
+        if self._model is None:
+            super().__setattr__(name, value)
+            return
+        with self._model.locked():
+            super().__setattr__(name, value)
+            field = type(self).model_fields.get(name)
+            if field is not None and not field.exclude:
+                self._model.field_changed(self, name)
+
+
+class Participant(Tracked):
+    __slots__ = ("reservations",)
+
+    uid: UUID = Field(default_factory=uuid4)
+    names: dict[str, str]
+    add_default: bool = False
+    note: str = ""
+
+    def model_post_init(self, context):
+        super().model_post_init(context)
+        object.__setattr__(self, "reservations", [])
+
+    def all_names(self) -> str:
+        return "/".join((n for n in self.names.values() if n))
+
+def participant_search_texts(participant: Participant) -> list[str]:
+    return [*participant.names.values(), participant.note]
+
+def empty_statistics() -> dict:
+    return {"total": 0, "expected": 0, "cancelled": 0, "shows": 0, "noshows": 0}
+
+def make_statistics(total: int, expected: int, shows: int) -> dict:
+    return {"total": total, "expected": expected, "cancelled": total - expected, "shows": shows, "noshows": expected - shows}
+
+def add_statistics(statistics: dict, delta: dict, sign: int = 1):
+    for k, v in delta.items():
+        statistics[k] += sign * v
+
+
+class Event(Tracked):
+    __slots__ = ("reservations", "statistics")
+
+    uid: UUID = Field(default_factory=uuid4)
+    date: datetime.date
+
+    check_statistics: ClassVar[bool] = False
+
+    def model_post_init(self, context):
+        super().model_post_init(context)
+        object.__setattr__(self, "reservations", [])
+        object.__setattr__(self, "statistics", empty_statistics())
+
+    def calculate_statistics(self) -> dict:
+        total = sum((r.counter.count_max for r in self.reservations))
+        expected = sum((r.counter.count for r in self.reservations))
+        shows = sum((r.counter.showed for r in self.reservations))
+        return make_statistics(total, expected, shows)
+
+    def recalculate_statistics(self) -> bool:
+        old = dict(self.statistics)
+        new = self.calculate_statistics()
+        self.statistics.update(new)
+        if old != new and self._model is not None:
+            self._model._series.set(self.date, self.statistics)
+            self._model.notify(self)
+        return old == new
+
+    def apply_counter_delta(self, total: int, expected: int, shows: int):
+        if self._model is not None and self._model._batch is not None:
+            pending = self._model._batch.deltas.setdefault(self.uid, [self, 0, 0, 0])
+            pending[1] += total
+            pending[2] += expected
+            pending[3] += shows
+            return
+        delta = make_statistics(total, expected, shows)
+        add_statistics(self.statistics, delta)
+        if self._model is not None:
+            self._model._series.add(self.date, delta)
+            self._model.notify(self)
+        if self.check_statistics and not self.recalculate_statistics():
+            logger.warning(f"statistics of event {self.date} were out of sync, recalculated")
+
+
+class Counter:
+    __slots__ = ("count", "count_max", "showed")
+
+    def __init__(self, count: int = 1, count_max: int = 1, showed: int = 0):
+        self.count = count
+        self.count_max = count_max
+        self.showed = showed
+
+    def __eq__(self, other):
+        return isinstance(other, Counter) and (self.count, self.count_max, self.showed) == (other.count, other.count_max, other.showed)
+
+    def __repr__(self):
+        return f"Counter(count={self.count}, count_max={self.count_max}, showed={self.showed})"
+
+    def as_dict(self) -> dict:
+        return {"count": self.count, "count_max": self.count_max, "showed": self.showed}
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        field = core_schema.typed_dict_field(core_schema.int_schema(), required=False)
+        from_dict = core_schema.no_info_after_validator_function(lambda d: cls(**d), core_schema.typed_dict_schema({"count": field, "count_max": field, "showed": field}))
+        return core_schema.union_schema([core_schema.is_instance_schema(cls), from_dict], serialization=core_schema.plain_serializer_function_ser_schema(cls.as_dict))
+
+    def can_cancel(self) -> bool:
+        return self.count > 0
+
+    def can_add_showed(self):
+        return self.showed < self.count
+
+    def can_remove_showed(self):
+        return self.showed > 0
+
+
+
+class Reservation(Tracked):
+    __slots__ = ("event", "participant", "_connected")
+
+    uid: UUID = Field(default_factory=uuid4)
+    added_time: datetime.datetime = Field(default_factory=datetime.datetime.now)
+    source: Optional[str]
+
+    counter_internal: Counter = Field(default_factory=Counter)
+
+    def model_post_init(self, context):
+        super().model_post_init(context)
+        object.__setattr__(self, "event", None)
+        object.__setattr__(self, "participant", None)
+        object.__setattr__(self, "_connected", False)
+
+    @property
+    def counter(self) -> Counter:
+        return self.counter_internal
+
+    @counter.setter
+    def counter(self, counter: Counter):
+        self.update_counter(counter.count, counter.count_max, counter.showed)
+
+    def update_counter(self, count: int, count_max: int, showed: int):
+        if self._model is None:
+            self._set_counter(count, count_max, showed)
+            return
+        with self._model.locked():
+            delta = self._set_counter(count, count_max, showed)
+            self._model.field_changed(self, "counter_internal", delta={"count": delta[1], "count_max": delta[0], "showed": delta[2]})
+
+    def _set_counter(self, count: int, count_max: int, showed: int) -> tuple[int, int, int]:
+        c = self.counter_internal
+        delta = (count_max - c.count_max, count - c.count, showed - c.showed)
+        c.count, c.count_max, c.showed = count, count_max, showed
+        if self._connected:
+            self.event.apply_counter_delta(*delta)
+        return delta
+
+    @profiled("add_one")
+    def add_one(self):
+        c = self.counter_internal
+        self.update_counter(c.count + 1, max(c.count + 1, c.count_max), c.showed)
+
+    @profiled("cancel_one")
+    def cancel_one(self):
+        c = self.counter_internal
+        if c.can_cancel():
+            self.update_counter(c.count - 1, c.count_max, min(c.count - 1, c.showed))
+
+    @profiled("add_showed")
+    def add_showed(self):
+        c = self.counter_internal
+        if c.can_add_showed():
+            self.update_counter(c.count, c.count_max, c.showed + 1)
+
+    @profiled("remove_showed")
+    def remove_showed(self):
+        c = self.counter_internal
+        if c.can_remove_showed():
+            self.update_counter(c.count, c.count_max, c.showed - 1)
+
+    note: str = ""
+
+    event_uid: UUID
+    participant_uid: UUID
+
+    def link(self, event: Event, participant: Participant):
+        object.__setattr__(self, "event", event)
+        object.__setattr__(self, "participant", participant)
+
+    def connect(self):
+        self.event.reservations.append(self)
+        self.participant.reservations.append(self)
+        object.__setattr__(self, "_connected", True)
+        c = self.counter_internal
+        self.event.apply_counter_delta(c.count_max, c.count, c.showed)
+
+def journal_records(record: dict) -> list[dict]:
+    return record["records"] if record.get("op") == "batch" else [record]
+
+class Batch:
+    def __init__(self):
+        self.changed = False
+        self.records = []
+        self.deltas = {}
+        self.removed = set()
+        self.notify = {}
+
+
+class Model(BaseModel):
+    sources: list[str] = list()
+    known_names: list[str] = list()
+    participants: list[Participant] = list()
+    events: list[Event] = list()
+    reservations: list[Reservation] = list()
+
+    auto_purge_participants: bool = False
+    auto_remove_events: bool = False
+    auto_remove_events_after_days: int = 365
+    auto_archive_events: bool = False
+    auto_archive_events_after_days: int = 365
+    paged_tables: bool = False
+
+    __slots__ = ("_by_uid", "_event_by_date", "_event_dates", "_participant_by_name", "_participant_names", "_participant_search", "_reservation_by_pair", "_series",
+                 "_generation", "_saved_generation", "_journal", "_listeners", "_connected", "_lock", "_batch",
+                 "_epoch", "_changed_at", "_removed_at", "_history_floor")
+
+    collections: ClassVar[tuple[str, ...]] = ("participants", "events", "reservations")
+    removed_history: ClassVar[int] = 10000
+
+    def model_post_init(self, context):
+        runtime = {
+                "_by_uid": {},
+                "_event_by_date": {},
+                "_event_dates": [],
+                "_participant_by_name": {},
+                "_participant_names": {},
+                "_participant_search": SearchIndex(),
+                "_reservation_by_pair": {},
+                "_series": StatisticsSeries(),
+                "_generation": 0,
+                "_saved_generation": 0,
+                "_journal": None,
+                "_listeners": {},
+                "_connected": False,
+                "_lock": threading.RLock(),
+                "_batch": None,
+                "_epoch": uuid4().hex[:8],
+                "_changed_at": {},
+                "_removed_at": {},
+                "_history_floor": 0,
+                }
+        for name, value in runtime.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        if name in Model.__slots__:
+            object.__setattr__(self, name, value)
+            return
+        with self._lock:
+            super().__setattr__(name, value)
+            if name in type(self).model_fields:
+                if name in self.collections:
+                    self.mark_changed()
+                else:
+                    self.field_changed(self, name)
+
+    def set_journal(self, journal: Optional[Callable[[dict], None]]):
+        self._journal = journal
+
+    def mark_changed(self, record: Optional[dict] = None):
+        if self._batch is not None:
+            self._batch.changed = True
+            if record is not None and self._journal is not None:
+                self._batch.records.append(record)
+            return
+        self._generation += 1
+        if record is not None and self._journal is not None:
+            self._journal(record)
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            if self._batch is not None:
+                yield self
+                return
+            self._batch = Batch()
+            try:
+                yield self
+            finally:
+                self._commit()
+
+    @contextmanager
+    def applying_remote(self):
+        with self.transaction():
+            journal, self._journal = self._journal, None
+            try:
+                yield self
+            finally:
+                self._journal = journal
+
+    def is_stale(self, record: dict) -> bool:
+        if record["op"] != "set" or record["uid"] is None or "version" not in record:
+            return False
+        obj = self._by_uid.get(UUID(record["uid"]))
+        return obj is not None and record["version"] < obj.version
+
+    def apply_remote(self, records: list[dict]):
+        with self.applying_remote():
+            for record in records:
+                for r in journal_records(record):
+                    if self.is_stale(r):
+                        continue
+                    try:
+                        self.apply_record(r)
+                    except (KeyError, ValueError) as e:
+                        logger.warning(f"skipping change {r} from another worker: {e}")
+
+    def in_transaction(self) -> bool:
+        return self._batch is not None
+
+    def locked(self) -> threading.RLock:
+        return self._lock
+
+    def _commit(self):
+        batch = self._batch
+        for collection in batch.removed:
+            setattr(self, collection, [o for o in getattr(self, collection) if o._model is self])
+        self._batch = None
+        for event, total, expected, shows in batch.deltas.values():
+            if event._model is self:
+                batch.notify.pop(event.uid, None)
+                event.apply_counter_delta(total, expected, shows)
+        if batch.changed:
+            self._generation += 1
+            if batch.records and self._journal is not None:
+                self._journal(batch.records[0] if len(batch.records) == 1 else {"op": "batch", "records": batch.records})
+        for obj in batch.notify.values():
+            self.notify(obj)
+
+    def _set_record(self, obj: BaseModel, field: str, value, **extra) -> dict:
+        record = {"op": "set", "kind": type(obj).__name__.lower(), "uid": None if obj is self else str(obj.uid), "field": field, "value": value, **extra}
+        if obj is not self:
+            record["version"] = obj.version
+            object.__setattr__(obj, "version", obj.version + 1)
+        return record
+
+    def _touch(self, obj: BaseModel):
+        if obj is not self:
+            self._changed_at[obj.uid] = self._generation + 1
+
+    def _forget(self, obj: BaseModel):
+        self._changed_at.pop(obj.uid, None)
+        self._removed_at[obj.uid] = self._generation + 1
+        if len(self._removed_at) > self.removed_history:
+            for uid in list(islice(self._removed_at, len(self._removed_at) // 2)):
+                self._history_floor = max(self._history_floor, self._removed_at.pop(uid))
+
+    def _field_updated(self, obj: BaseModel, name: str):
+        self._touch(obj)
+        if name == "note" and isinstance(obj, Participant):
+            self._participant_search.set(obj.uid, participant_search_texts(obj))
+
+    def field_changed(self, obj: BaseModel, name: str, **extra):
+        with self._lock:
+            self._field_updated(obj, name)
+            record = None
+            if self._journal is not None:
+                value = obj.model_dump(mode="json", include={name})[name]
+                record = self._set_record(obj, name, value, **extra)
+            self.mark_changed(record)
+            self.notify(obj)
+
+    def _listener_key(self, obj: BaseModel) -> Optional[UUID]:
+        return None if obj is self else obj.uid
+
+    def subscribe(self, obj: BaseModel, listener: Callable[[], None]):
+        self._listeners.setdefault(self._listener_key(obj), []).append(listener)
+
+    def unsubscribe(self, obj: BaseModel, listener: Callable[[], None]):
+        key = self._listener_key(obj)
+        listeners = self._listeners.get(key, [])
+        if listener in listeners:
+            listeners.remove(listener)
+        if not listeners:
+            self._listeners.pop(key, None)
+
+    def notify(self, obj: BaseModel):
+        if self._batch is not None:
+            self._batch.notify[self._listener_key(obj)] = obj
+            return
+        for listener in list(self._listeners.get(self._listener_key(obj), ())):
+            try:
+                listener()
+            except Exception:
+                logger.exception(f"change listener of {obj!r} failed")
+
+    def generation(self) -> int:
+        return self._generation
+
+    def is_dirty(self) -> bool:
+        return self._generation != self._saved_generation
+
+    def mark_saved(self, generation: int):
+        self._saved_generation = generation
+
+    def backup_version(self) -> str:
+        return f"{self._epoch}-{self._generation}"
+
+    def changed_since(self, version: str) -> dict:
+        epoch, _, generation = version.partition("-")
+        if epoch != self._epoch or not generation.isdigit() or not self._history_floor <= int(generation) <= self._generation:
+            raise KeyError(version)
+        since = int(generation)
+        changed = [self._by_uid[uid] for uid, g in self._changed_at.items() if g > since]
+        data = self.model_dump(mode="json", exclude=set(self.collections))
+        for collection, T in (("participants", Participant), ("events", Event), ("reservations", Reservation)):
+            data[collection] = [o.model_dump(mode="json") for o in changed if isinstance(o, T)]
+        data["removed"] = [str(uid) for uid, g in self._removed_at.items() if g > since]
+        data["since"] = version
+        data["version"] = self.backup_version()
+        return data
+
+    def connect(self):
+        if self._connected:
+            return
+        self.rebuild_indexes()
+        for reservation in self.reservations:
+            reservation.link(self.event_by_uid(reservation.event_uid), self.participant_by_uid(reservation.participant_uid))
+            reservation.connect()
+        self._connected = True
+        if Event.check_statistics:
+            self.recalculate_statistics()
+
+    def apply_record(self, record: dict):
+        op = record["op"]
+        if op == "set":
+            obj = self if record["uid"] is None else self.object_by_uid(UUID(record["uid"]))
+            field, value = record["field"], record["value"]
+            if isinstance(obj, Event) and field == "date":
+                self.set_event_date(obj, datetime.date.fromisoformat(value))
+            elif isinstance(obj, Reservation) and field == "counter_internal":
+                obj.counter = Counter(**value)
+            else:
+                obj.__pydantic_validator__.validate_assignment(obj, field, value)
+                if isinstance(obj, Participant) and field == "names":
+                    self.update_participant_names(obj)
+                else:
+                    self._field_updated(obj, field)
+                    self.mark_changed()
+                    self.notify(obj)
+            if obj is not self and "version" in record:
+                object.__setattr__(obj, "version", record["version"] + 1)
+        elif op == "add_event":
+            if UUID(record["data"]["uid"]) not in self._by_uid:
+                self.add_event(Event.model_validate(record["data"]))
+        elif op == "add_participant":
+            if UUID(record["data"]["uid"]) not in self._by_uid:
+                self.add_participant(Participant.model_validate(record["data"]))
+        elif op == "add_reservation":
+            if UUID(record["data"]["uid"]) not in self._by_uid:
+                self.add_reservation(Reservation.model_validate(record["data"]))
+        elif op == "remove_event":
+            if UUID(record["uid"]) in self._by_uid:
+                self.remove_event(self.event_by_uid(UUID(record["uid"])))
+        elif op == "remove_participants":
+            self.remove_participants([self.participant_by_uid(UUID(uid)) for uid in record["uids"] if UUID(uid) in self._by_uid])
+        elif op == "batch":
+            with self.transaction():
+                for batch_record in record["records"]:
+                    self.apply_record(batch_record)
+        else:
+            raise ValueError(f"unknown journal operation {op}")
+
+    def rebuild_indexes(self):
+        self._by_uid.clear()
+        self._event_by_date.clear()
+        self._event_dates.clear()
+        self._participant_by_name.clear()
+        self._participant_names.clear()
+        self._reservation_by_pair.clear()
+        self._series.clear()
+        for e in self.events:
+            self._index_event(e)
+        for p in self.participants:
+            self._index_participant(p, search=False)
+        self._participant_search.rebuild((p.uid, participant_search_texts(p)) for p in self.participants)
+        for r in self.reservations:
+            self._index_reservation(r)
+
+    def _index_event(self, event: Event):
+        self._by_uid[event.uid] = event
+        self._event_by_date[event.date] = event
+        bisect.insort(self._event_dates, event.date)
+        event.attach(self)
+        self._series.set(event.date, event.statistics)
+
+    def _unindex_event(self, event: Event):
+        self._by_uid.pop(event.uid, None)
+        if self._event_by_date.get(event.date) is event:
+            del self._event_by_date[event.date]
+            del self._event_dates[bisect.bisect_left(self._event_dates, event.date)]
+        if event._model is self:
+            self._series.remove(event.date)
+            event.attach(None)
+
+    def _index_participant(self, participant: Participant, search: bool = True):
+        self._by_uid[participant.uid] = participant
+        participant.attach(self)
+        old_keys = self._participant_names.get(participant.uid)
+        self._unindex_participant_names(participant)
+        keys = [(source, name) for source, name in participant.names.items() if name]
+        for key in keys:
+            self._participant_by_name.setdefault(key, {})[participant.uid] = participant
+        self._participant_names[participant.uid] = keys
+        if search:
+            self._participant_search.set(participant.uid, participant_search_texts(participant))
+        return old_keys != keys
+
+    def _unindex_participant_names(self, participant: Participant):
+        for key in self._participant_names.pop(participant.uid, []):
+            holders = self._participant_by_name.get(key)
+            if holders is not None:
+                holders.pop(participant.uid, None)
+                if not holders:
+                    del self._participant_by_name[key]
+
+    def _unindex_participant(self, participant: Participant):
+        self._by_uid.pop(participant.uid, None)
+        self._unindex_participant_names(participant)
+        self._participant_search.remove(participant.uid)
+        participant.attach(None)
+
+    def _index_reservation(self, reservation: Reservation):
+        self._by_uid[reservation.uid] = reservation
+        reservation.attach(self)
+        self._reservation_by_pair[(reservation.event_uid, reservation.participant_uid)] = reservation
+
+    def _unindex_reservation(self, reservation: Reservation):
+        self._by_uid.pop(reservation.uid, None)
+        reservation.attach(None)
+        key = (reservation.event_uid, reservation.participant_uid)
+        if self._reservation_by_pair.get(key) is reservation:
+            del self._reservation_by_pair[key]
+
+    def statistics_series(self) -> StatisticsSeries:
+        return self._series
+
+    def recalculate_statistics(self) -> bool:
+        in_sync = True
+        for e in self.events:
+            if not e.recalculate_statistics():
+                logger.warning(f"statistics of event {e.date} were out of sync, recalculated")
+                in_sync = False
+        return in_sync
+
+    def object_by_uid(self, uid: UUID, T=object):
+        o = self._by_uid.get(uid)
+        if not isinstance(o, T):
+            raise KeyError(uid)
+        return o
+
+    def event_by_uid(self, uid: UUID) -> Event:
+        return self.object_by_uid(uid, Event)
+
+    def participant_by_uid(self, uid: UUID) -> Participant:
+        return self.object_by_uid(uid, Participant)
+
+    def reservation_by_uid(self, uid: UUID) -> Reservation:
+        return self.object_by_uid(uid, Reservation)
+    
+    def event_by_date(self, date: datetime.date|str):
+        if isinstance(date, str):
+            date = datetime.date.fromisoformat(date)
+        return self._event_by_date[date]
+
+    def event_dates(self) -> list[datetime.date]:
+        return self._event_dates
+
+    def split_event_dates(self, last_past: datetime.date) -> tuple[list[datetime.date], list[datetime.date]]:
+        i = bisect.bisect_right(self._event_dates, last_past)
+        return self._event_dates[i:], self._event_dates[i - 1::-1] if i else []
+
+    def first_event_after(self, date: datetime.date) -> Optional[Event]:
+        i = bisect.bisect_right(self._event_dates, date)
+        return self._event_by_date[self._event_dates[i]] if i < len(self._event_dates) else None
+
+    def events_before(self, date: datetime.date) -> list[Event]:
+        return [self._event_by_date[d] for d in self._event_dates[:bisect.bisect_left(self._event_dates, date)]]
+
+    def events_between(self, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> list[Event]:
+        first = 0 if start is None else bisect.bisect_left(self._event_dates, start)
+        last = len(self._event_dates) if end is None else bisect.bisect_right(self._event_dates, end)
+        return [self._event_by_date[d] for d in self._event_dates[first:last]]
+
+    def get_reservation(self, event: Event, participant: Participant):
+        return self._reservation_by_pair[(event.uid, participant.uid)]
+
+    def search_participants(self, query: str, limit: int = 20, exclude: Container[UUID] = ()) -> list[Participant]:
+        return [self._by_uid[uid] for uid in self._participant_search.search(query, limit, exclude)]
+
+    def get_participant_by_name(self, name: str, name_source: str) -> Participant:
+        try:
+            return next(iter(self._participant_by_name[(name_source, name)].values()))
+        except KeyError:
+            raise KeyError(name) from None
+
+    def add_event(self, event: Event):
+        with self.transaction():
+            if event.date in self._event_by_date:
+                raise KeyError(event.date)
+            self.events.append(event)
+            self._index_event(event)
+            self._touch(event)
+            self.mark_changed({"op": "add_event", "data": event.model_dump(mode="json")})
+
+    def set_event_date(self, event: Event, date: datetime.date):
+        if date == event.date:
+            return
+        with self.transaction():
+            if date in self._event_by_date:
+                raise KeyError(date)
+            self._unindex_event(event)
+            event.date = date
+            self._index_event(event)
+            self._touch(event)
+            self.mark_changed(self._set_record(event, "date", date.isoformat()))
+
+    def add_participant(self, participant: Participant):
+        with self.transaction():
+            self.participants.append(participant)
+            self._index_participant(participant)
+            self._touch(participant)
+            self.mark_changed({"op": "add_participant", "data": participant.model_dump(mode="json")})
+
+    def update_participant_names(self, participant: Participant):
+        with self.transaction():
+            if self._index_participant(participant):
+                self._touch(participant)
+                self.mark_changed(self._set_record(participant, "names", dict(participant.names)))
+                self.notify(participant)
+
+    def add_reservation(self, reservation: Reservation):
+        with self.transaction():
+            if reservation.event is None or reservation.participant is None:
+                reservation.link(self.event_by_uid(reservation.event_uid), self.participant_by_uid(reservation.participant_uid))
+            reservation.connect()
+            self.reservations.append(reservation)
+            self._index_reservation(reservation)
+            self._touch(reservation)
+            self.mark_changed({"op": "add_reservation", "data": reservation.model_dump(mode="json")})
+
+    def make_reservation(self, event: Event, participant: Participant, source: str="TODO", **kwargs) -> Reservation:
+        r = Reservation(event_uid=event.uid, participant_uid=participant.uid, source=source, **kwargs)
+        r.link(event, participant)
+        self.add_reservation(r)
+        return r
+
+    def bulk_add(self, participants: list[Participant], reservations: list[Reservation]):
+        with self.transaction():
+            for participant in participants:
+                self.add_participant(participant)
+            for reservation in reservations:
+                self.add_reservation(reservation)
+
+    def remove_event(self, event: Event):
+        if event._model is not self:
+            return
+        with self.transaction():
+            self._unindex_event(event)
+            self._listeners.pop(event.uid, None)
+            self._batch.removed.add("events")
+            self._forget(event)
+            if event.reservations:
+                self._batch.removed.add("reservations")
+            for r in event.reservations:
+                self._unindex_reservation(r)
+                self._forget(r)
+                object.__setattr__(r, "_connected", False)
+                self._listeners.pop(r.uid, None)
+                reservations = r.participant.reservations
+                del reservations[next(i for i, x in enumerate(reservations) if x is r)]
+            self.mark_changed({"op": "remove_event", "uid": str(event.uid)})
+
+    def remove_participants(self, participants: list[Participant]):
+        participants = [p for p in participants if p._model is self]
+        if not participants:
+            return
+        with self.transaction():
+            for p in participants:
+                self._unindex_participant(p)
+                self._listeners.pop(p.uid, None)
+                self._batch.removed.add("participants")
+                self._forget(p)
+            self.mark_changed({"op": "remove_participants", "uids": [str(p.uid) for p in participants]})
+
+    def purge_participants(self):
+        with self.transaction():
+            self.remove_participants([p for p in self.participants if len(p.reservations) == 0])
@@ -0,0 +1,199 @@
+import argparse
+import logging
+import os
+from typing import Callable, Optional
+from uuid import UUID
+
+import pydantic_core
+
+from muncher import metrics
+from muncher.archive import Archive
+from muncher.backup_save import BackupSave
+from muncher.model import Event, Model, Participant, Reservation, journal_records
+from muncher.profiling import profiled
+from muncher.sqlite_store import UPDATABLE, ConflictError, SqliteStore
+
+logger = logging.getLogger(__name__)
+
+storage_formats = {
+        "indented": (2, None),
+        "compact": (None, None),
+        "gzip": (None, "gzip"),
+        "lzma": (None, "lzma"),
+        }
+
+resync_pending = False
+
+def add_storage_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--folder", type=str, default="data", required=False)
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json", help="sqlite migrates existing json data on first start")
+    parser.add_argument("--format", choices=storage_formats.keys(), default="indented", help="storage format of the data file and its backups, existing files are detected automatically")
+    parser.add_argument("--journal", action="store_true", help="append changes to a journal and only rewrite the snapshot when the journal grows too large or old")
+    parser.add_argument("--journal-max-bytes", type=int, default=1024*1024)
+    parser.add_argument("--journal-max-age", type=float, default=3600.0, help="seconds")
+    parser.add_argument("--keep-last", type=int, default=5, help="number of most recent backups to keep")
+    parser.add_argument("--keep-hourly", type=int, default=24, help="additionally keep the newest backup of each of the last N hours with backups")
+    parser.add_argument("--keep-daily", type=int, default=14, help="additionally keep the newest backup of each of the last N days with backups")
+    parser.add_argument("--keep-weekly", type=int, default=8, help="additionally keep the newest backup of each of the last N weeks with backups")
+
+def open_sqlite_store(folder: str, migrate: bool = True) -> SqliteStore:
+    store = SqliteStore(os.path.join(folder, "data.sqlite"), validator=Model.model_validate_json)
+    if migrate and store.is_empty():
+        migrate_to_sqlite(store, folder)
+    return store
+
+def open_json_store(args, journal: Optional[bool] = None) -> BackupSave:
+    _, compression = storage_formats[args.format]
+    return BackupSave(folder=args.folder, basename="data.json", validator=Model.model_validate_json, replay=replay_journal,
+                      journal=args.journal if journal is None else journal, journal_max_bytes=args.journal_max_bytes, journal_max_age=args.journal_max_age,
+                      compression=compression, num_keep=args.keep_last, keep_hourly=args.keep_hourly, keep_daily=args.keep_daily, keep_weekly=args.keep_weekly)
+
+def open_data_store(args):
+    if args.storage == "sqlite":
+        return open_sqlite_store(args.folder)
+    return open_json_store(args)
+
+def open_archive(args) -> Archive:
+    _, compression = storage_formats[args.format]
+    return Archive(os.path.join(args.folder, "archive"), validator=Model.model_validate_json, compression=compression)
+
+@profiled("load")
+def load_model(data_store, indent: Optional[int] = 2, example: bool = True) -> Model:
+    try:
+        with metrics.load_seconds.time():
+            m = data_store.load()
+    except RuntimeError:
+        if not example:
+            raise
+        print("unable to load json")
+        m = Model()
+        add_example_data(m)
+        m.connect()
+        m.set_journal(journal_for(m, data_store))
+        if data_store.journal:
+            save(m, data_store, force=True, indent=indent)
+    else:
+        m.connect()
+        m.mark_saved(m.generation())
+        m.set_journal(journal_for(m, data_store))
+    return m
+
+def journal_for(m: Model, data_store) -> Optional[Callable[[dict], None]]:
+    if not data_store.journal:
+        return None
+    if not isinstance(data_store, SqliteStore):
+        return data_store.append
+    return lambda record: append_with_retry(m, data_store, record)
+
+def append_with_retry(m: Model, store: SqliteStore, record: dict, max_tries: int = 5):
+    global resync_pending
+    for _ in range(max_tries):
+        try:
+            store.append(record)
+            return
+        except ConflictError as e:
+            if not e.records or not rebase_conflicts(m, store, record, e.records):
+                logger.warning(f"unable to resolve conflicting write, reloading from the shared store: {e}")
+                break
+    else:
+        logger.warning(f"write still conflicting after {max_tries} tries, reloading from the shared store")
+    resync_pending = True
+
+def merge_counter(counter: dict, delta: dict) -> dict:
+    count = max(0, counter["count"] + delta["count"])
+    count_max = max(count, counter["count_max"] + delta["count_max"])
+    showed = min(count, max(0, counter["showed"] + delta["showed"]))
+    return {"count": count, "count_max": count_max, "showed": showed}
+
+def rebase_conflicts(m: Model, store: SqliteStore, record: dict, conflicts: list[dict]) -> bool:
+    uids = {r["uid"] for r in conflicts}
+    fresh = {}
+    for r in journal_records(record):
+        if r["op"] != "set" or r["uid"] not in uids or "version" not in r:
+            continue
+        current = fresh.get(r["uid"])
+        if current is None:
+            current = fresh[r["uid"]] = store.fetch(r["kind"], r["uid"])
+            if current is None:
+                return False
+        if r["field"] == "counter_internal" and "delta" in r:
+            r["value"] = merge_counter(current["counter_internal"], r["delta"])
+        current[r["field"]] = r["value"]
+        r["version"] = current["version"]
+        current["version"] += 1
+    try:
+        with m.applying_remote():
+            for uid, current in fresh.items():
+                obj = m.object_by_uid(UUID(uid))
+                kind = type(obj).__name__.lower()
+                for field in UPDATABLE[kind] | {"counter_internal"}:
+                    if field in current:
+                        m.apply_record({"op": "set", "kind": kind, "uid": uid, "field": field, "value": current[field]})
+                object.__setattr__(obj, "version", current["version"])
+    except (KeyError, ValueError) as e:
+        logger.warning(f"unable to rebase conflicting write: {e}")
+        return False
+    return True
+
+def migrate_to_sqlite(store: SqliteStore, folder: str):
+    source = BackupSave(folder=folder, basename="data.json", validator=Model.model_validate_json, replay=replay_journal, journal=True)
+    try:
+        m = source.load()
+    except RuntimeError as e:
+        logger.warning(f"nothing to migrate: {e}")
+        return
+    store.save(m.model_dump_json())
+    logger.info(f"migrated data from {folder} to {store.filename}")
+
+def replay_journal(m: Model, records: list[dict]) -> Model:
+    m.connect()
+    with m.transaction():
+        for record in records:
+            for r in journal_records(record):
+                try:
+                    m.apply_record(r)
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"skipping journal record {r}: {e}")
+    return m
+
+def add_example_data(m: Model):
+    m.sources = ["PM", "FL"]
+    m.known_names = ["real", "FL"]
+    e = Event(date="2025-01-01")
+    m.events.append(e)
+    p = Participant(names={"real": "Kurt", "FL": "somebody"})
+    m.participants.append(p)
+    m.participants.append(Participant(names={"real": "Max", "FL": "whatever"}))
+    r = Reservation(event_uid=e.uid, participant_uid=p.uid, source="FL")
+    m.reservations.append(r)
+
+
+def prepare_save(m: Model, data_store, force=False) -> Optional[tuple[Model, int, dict]]:
+    with m.locked():
+        if m.in_transaction():
+            metrics.save_skips.inc(reason="transaction")
+            return None
+        if not (force or m.is_dirty()):
+            metrics.save_skips.inc(reason="clean")
+            return None
+        if data_store.journal and not (force or data_store.needs_snapshot()):
+            metrics.save_skips.inc(reason="journal")
+            m.mark_saved(m.generation())
+            return None
+        data_store.begin_snapshot()
+        return m, m.generation(), m.model_dump()
+
+@profiled("save")
+def write_snapshot(data_store, snapshot: dict, indent: Optional[int] = 2) -> bool:
+    with metrics.save_seconds.time():
+        data_store.save(pydantic_core.to_json(snapshot, indent=indent))
+    return True
+
+def save(m: Model, data_store, force=False, indent: Optional[int] = 2) -> bool:
+    prepared = prepare_save(m, data_store, force)
+    if prepared is None:
+        return False
+    m, generation, snapshot = prepared
+    write_snapshot(data_store, snapshot, indent)
+    m.mark_saved(generation)
+    return True
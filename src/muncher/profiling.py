@@ -0,0 +1,97 @@
+import cProfile
+import datetime
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.threshold = 0.5
+        self.profile_every = 0
+        self.folder = None
+        self.size = None
+        self._calls = {}
+        self._active = False
+        self._lock = threading.Lock()
+
+    def configure(self, threshold: Optional[float] = None, profile_every: int = 0, folder: Optional[str] = None, size: Optional[Callable[[], dict]] = None):
+        self.threshold = threshold if threshold is not None else float("inf")
+        self.profile_every = profile_every
+        self.folder = folder
+        self.size = size
+        self.enabled = threshold is not None or profile_every > 0
+        if self.profile_every > 0 and self.folder is not None:
+            os.makedirs(self.folder, exist_ok=True)
+
+    def _start(self, operation: str) -> Optional[cProfile.Profile]:
+        if self.profile_every <= 0 or self.folder is None:
+            return None
+        with self._lock:
+            calls = self._calls[operation] = self._calls.get(operation, 0) + 1
+            if calls % self.profile_every != 0 or self._active:
+                return None
+            self._active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def _finish(self, operation: str, start: float, profile: Optional[cProfile.Profile]):
+        duration = time.perf_counter() - start
+        filename = None
+        if profile is not None:
+            profile.disable()
+            filename = os.path.join(self.folder, f"{operation.replace(':', '_')}_{datetime.datetime.now().strftime('%Y%m%dT%H%M%S.%f')}.prof")
+            try:
+                profile.dump_stats(filename)
+            except OSError as e:
+                logger.warning(f"unable to write profile {filename}: {e}")
+                filename = None
+            with self._lock:
+                self._active = False
+        if duration >= self.threshold:
+            record = {"operation": operation, "seconds": round(duration, 6)}
+            if self.size is not None:
+                record.update(self.size())
+            if filename is not None:
+                record["profile"] = filename
+            logger.warning(f"slow operation {json.dumps(record)}")
+
+    def wrap(self, operation: str):
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    profile = self._start(operation)
+                    start = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self._finish(operation, start, profile)
+                return async_wrapper
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                profile = self._start(operation)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self._finish(operation, start, profile)
+            return wrapper
+        return decorator
+
+
+profiler = Profiler()
+profiled = profiler.wrap
@@ -0,0 +1,128 @@
+import csv
+import datetime
+import io
+import json
+from typing import Iterable, Iterator, Optional
+
+from muncher.model import Model, Participant, empty_statistics, make_statistics
+
+statistics_fields = ("total", "shows", "noshows", "cancelled")
+
+export_chunk_size = 64*1024
+
+def last_past_date() -> datetime.date:
+    return datetime.date.today() - datetime.timedelta(days=2)
+
+def past_end(end: Optional[datetime.date]) -> datetime.date:
+    last_past = last_past_date()
+    return last_past if end is None else min(end, last_past)
+
+def statistics_data(m: Model, fields, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None, period: str = "event") -> tuple[list[datetime.date], dict[str, list[int]]]:
+    end = past_end(end)
+    labels, data = m.statistics_series().rollup(fields, period, start, end)
+    return labels[::-1], {f: values[::-1] for f, values in data.items()}
+
+def statistics_totals(m: Model, fields, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> dict[str, int]:
+    end = past_end(end)
+    return m.statistics_series().totals(fields, start, end)
+
+def statistics_rows(labels: list[datetime.date], data: dict[str, list[int]], totals: dict[str, int], fields) -> list[dict]:
+    rows = [{"date": "all selected", **totals}]
+    rows += [{"date": label.isoformat(), **{f: data[f][i] for f in fields}} for i, label in enumerate(labels)]
+    return rows
+
+def write_statistics_csv(file, m: Model, fields=statistics_fields, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None, period: str = "event"):
+    labels, data = statistics_data(m, fields, start, end, period)
+    writer = csv.DictWriter(file, fieldnames=["date", *fields])
+    writer.writeheader()
+    writer.writerows(statistics_rows(labels, data, statistics_totals(m, fields, start, end), fields))
+
+
+def name_fields(m: Model) -> list[str]:
+    return [f"name_{name}" for name in m.known_names]
+
+def participant_names(m: Model, p: Participant) -> dict:
+    return {f"name_{name}": p.names.get(name, "") for name in m.known_names}
+
+def attendance_fields(m: Model) -> list[str]:
+    return ["date", "event_uid", "reservation_uid", "participant_uid", *name_fields(m), "source", "added_time", "count", "count_max", "showed", "note"]
+
+def attendance_rows(m: Model, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> Iterator[dict]:
+    for event in m.events_between(start, end):
+        with m.locked():
+            rows = [{"date": event.date.isoformat(), "event_uid": str(event.uid), "reservation_uid": str(r.uid), "participant_uid": str(r.participant_uid),
+                     **participant_names(m, r.participant), "source": r.source, "added_time": r.added_time.isoformat(), **r.counter.as_dict(), "note": r.note}
+                    for r in event.reservations]
+        yield from rows
+
+def event_fields(m: Model) -> list[str]:
+    return ["date", "event_uid", "reservations", *empty_statistics()]
+
+def event_rows(m: Model, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> Iterator[dict]:
+    for event in m.events_between(start, end):
+        with m.locked():
+            row = {"date": event.date.isoformat(), "event_uid": str(event.uid), "reservations": len(event.reservations), **event.statistics}
+        yield row
+
+def participant_fields(m: Model) -> list[str]:
+    return ["participant_uid", *name_fields(m), "add_default", "note", "events", *empty_statistics(), "first_event", "last_event"]
+
+def participant_rows(m: Model, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> Iterator[dict]:
+    for p in list(m.participants):
+        with m.locked():
+            dates = []
+            total = expected = shows = 0
+            for r in p.reservations:
+                date = r.event.date
+                if (start is not None and date < start) or (end is not None and date > end):
+                    continue
+                dates.append(date)
+                total += r.counter.count_max
+                expected += r.counter.count
+                shows += r.counter.showed
+            row = {"participant_uid": str(p.uid), **participant_names(m, p), "add_default": p.add_default, "note": p.note, "events": len(dates),
+                   **make_statistics(total, expected, shows), "first_event": min(dates).isoformat() if dates else "", "last_event": max(dates).isoformat() if dates else ""}
+        if dates or (start is None and end is None):
+            yield row
+
+export_kinds = {
+        "attendance": (attendance_fields, attendance_rows),
+        "events": (event_fields, event_rows),
+        "participants": (participant_fields, participant_rows),
+        }
+
+def csv_chunks(fields: list[str], rows: Iterable[dict]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= export_chunk_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+def ndjson_chunks(fields: list[str], rows: Iterable[dict]) -> Iterator[bytes]:
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, separators=(",", ":"))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= export_chunk_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+            size = 0
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+export_formats = {
+        "csv": ("text/csv", csv_chunks),
+        "ndjson": ("application/x-ndjson", ndjson_chunks),
+        }
+
+def export_chunks(m: Model, kind: str, format: str = "csv", start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> Iterator[bytes]:
+    fields, rows = export_kinds[kind]
+    _, encode = export_formats[format]
+    return encode(fields(m), rows(m, start, end))
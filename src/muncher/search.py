@@ -0,0 +1,69 @@
+import bisect
+import unicodedata
+from typing import Container, Hashable, Iterable
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+class SearchIndex:
+    def __init__(self):
+        self._texts = {}
+        self._words = []
+
+    def __len__(self):
+        return len(self._texts)
+
+    def clear(self):
+        self._texts.clear()
+        self._words.clear()
+
+    def rebuild(self, items: Iterable[tuple[Hashable, Iterable[str]]]):
+        self.clear()
+        for key, texts in items:
+            self._texts[key] = normalize(" ".join(t for t in texts if t))
+        self._words = sorted((word, key) for key, text in self._texts.items() for word in set(text.split()))
+
+    def set(self, key: Hashable, texts: Iterable[str]):
+        text = normalize(" ".join(t for t in texts if t))
+        if self._texts.get(key) == text:
+            return
+        self.remove(key)
+        self._texts[key] = text
+        for word in set(text.split()):
+            bisect.insort(self._words, (word, key))
+
+    def remove(self, key: Hashable):
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        for word in set(text.split()):
+            i = bisect.bisect_left(self._words, (word, key))
+            if i < len(self._words) and self._words[i] == (word, key):
+                del self._words[i]
+
+    def search(self, query: str, limit: int = 20, exclude: Container = ()) -> list:
+        words = normalize(query).split()
+        if not words:
+            return []
+        first, rest = words[0], words[1:]
+        results = []
+        seen = set()
+        i = bisect.bisect_left(self._words, (first,))
+        while i < len(self._words) and len(results) < limit and self._words[i][0].startswith(first):
+            key = self._words[i][1]
+            i += 1
+            if key in seen:
+                continue
+            seen.add(key)
+            text = self._texts[key]
+            if all(w in text for w in rest) and key not in exclude:
+                results.append(key)
+        if len(results) < limit:
+            for key, text in self._texts.items():
+                if first in text and all(w in text for w in rest) and key not in seen and key not in exclude:
+                    results.append(key)
+                    if len(results) == limit:
+                        break
+        return results
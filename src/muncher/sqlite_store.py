@@ -0,0 +1,264 @@
+import os
+import json
+import logging
+import sqlite3
+import threading
+from uuid import uuid4
+
+from muncher import metrics
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS participants (uid TEXT PRIMARY KEY, names TEXT NOT NULL, add_default INTEGER NOT NULL, note TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS events (uid TEXT PRIMARY KEY, date TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS reservations (
+    uid TEXT PRIMARY KEY, added_time TEXT NOT NULL, source TEXT, count INTEGER NOT NULL, count_max INTEGER NOT NULL,
+    showed INTEGER NOT NULL, note TEXT NOT NULL, event_uid TEXT NOT NULL, participant_uid TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, worker TEXT NOT NULL, record TEXT NOT NULL);
+CREATE UNIQUE INDEX IF NOT EXISTS events_date ON events (date);
+CREATE INDEX IF NOT EXISTS reservations_event ON reservations (event_uid);
+CREATE INDEX IF NOT EXISTS reservations_participant ON reservations (participant_uid);
+"""
+
+UPSERT = {
+        "participant": "INSERT INTO participants (uid, names, add_default, note) VALUES (:uid, :names, :add_default, :note) ON CONFLICT(uid) DO UPDATE SET names=excluded.names, add_default=excluded.add_default, note=excluded.note",
+        "event": "INSERT INTO events (uid, date) VALUES (:uid, :date) ON CONFLICT(uid) DO UPDATE SET date=excluded.date",
+        "reservation": "INSERT INTO reservations (uid, added_time, source, count, count_max, showed, note, event_uid, participant_uid) "
+                       "VALUES (:uid, :added_time, :source, :count, :count_max, :showed, :note, :event_uid, :participant_uid) ON CONFLICT(uid) DO UPDATE SET "
+                       "added_time=excluded.added_time, source=excluded.source, count=excluded.count, count_max=excluded.count_max, showed=excluded.showed, note=excluded.note",
+        }
+
+SELECT = {
+        "participant": "SELECT uid, names, add_default, note, version FROM participants",
+        "event": "SELECT uid, date, version FROM events",
+        "reservation": "SELECT uid, added_time, source, count, count_max, showed, note, event_uid, participant_uid, version FROM reservations",
+        }
+
+COLLECTIONS = {"participant": "participants", "event": "events", "reservation": "reservations"}
+UPDATABLE = {"participant": {"names", "add_default", "note"}, "event": {"date"}, "reservation": {"added_time", "source", "note"}}
+
+CHANGES_KEEP = 100000
+
+def participant_row(data):
+    return {"uid": data["uid"], "names": json.dumps(data["names"]), "add_default": int(data["add_default"]), "note": data["note"]}
+
+def event_row(data):
+    return {"uid": data["uid"], "date": data["date"]}
+
+def reservation_row(data):
+    counter = data["counter_internal"]
+    return {"uid": data["uid"], "added_time": data["added_time"], "source": data["source"], "count": counter["count"], "count_max": counter["count_max"],
+            "showed": counter["showed"], "note": data["note"], "event_uid": data["event_uid"], "participant_uid": data["participant_uid"]}
+
+ROWS = {"participant": participant_row, "event": event_row, "reservation": reservation_row}
+
+def participant_data(row):
+    uid, names, add_default, note, version = row
+    return {"uid": uid, "names": json.loads(names), "add_default": bool(add_default), "note": note, "version": version}
+
+def event_data(row):
+    uid, date, version = row
+    return {"uid": uid, "date": date, "version": version}
+
+def reservation_data(row):
+    uid, added_time, source, count, count_max, showed, note, event_uid, participant_uid, version = row
+    return {"uid": uid, "added_time": added_time, "source": source, "counter_internal": {"count": count, "count_max": count_max, "showed": showed},
+            "note": note, "event_uid": event_uid, "participant_uid": participant_uid, "version": version}
+
+DATA = {"participant": participant_data, "event": event_data, "reservation": reservation_data}
+
+
+class ConflictError(RuntimeError):
+    def __init__(self, message, records=()):
+        super().__init__(message)
+        self.records = list(records)
+
+
+class ResyncRequired(RuntimeError):
+    pass
+
+
+class SqliteStore:
+    journal = True
+
+    def __init__(self, filename, validator):
+        self.filename = filename
+        self.validator = validator
+        self.worker = uuid4().hex
+        self.seq = 0
+        self._logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        folder = os.path.dirname(filename)
+        if folder and not os.path.exists(folder):
+            self._logger.warning(f"directory {folder} does not exist, creating it")
+            os.makedirs(folder)
+        self._db = sqlite3.connect(filename, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        for collection in COLLECTIONS.values():
+            columns = [row[1] for row in self._db.execute(f"PRAGMA table_info({collection})")]
+            if "version" not in columns:
+                self._db.execute(f"ALTER TABLE {collection} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                self._logger.info(f"added version column to {collection}")
+
+    def is_empty(self):
+        with self._lock:
+            return self._db.execute("SELECT count(*) FROM settings").fetchone()[0] == 0
+
+    def _export(self, db, versions):
+        data = {key: json.loads(value) for key, value in db.execute("SELECT key, value FROM settings")}
+        order = {"event": " ORDER BY date"}
+        for kind, collection in COLLECTIONS.items():
+            data[collection] = [DATA[kind](row) for row in db.execute(SELECT[kind] + order.get(kind, ""))]
+            if not versions:
+                for item in data[collection]:
+                    del item["version"]
+        return json.dumps(data)
+
+    def export(self, versions=False):
+        with self._lock:
+            return self._export(self._db, versions)
+
+    def load(self):
+        if self.is_empty():
+            raise RuntimeError(f"no data in {self.filename}")
+        self._logger.info(f"loading data from {self.filename}")
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN")
+            try:
+                data = self._export(db, versions=True)
+                self.seq = db.execute("SELECT coalesce(max(seq), 0) FROM changes").fetchone()[0]
+            finally:
+                db.execute("COMMIT")
+        return self.validator(data)
+
+    def verify(self):
+        if self.is_empty():
+            return [(self.filename, "no data")]
+        with self._lock:
+            problems = [row[0] for row in self._db.execute("PRAGMA integrity_check")]
+        if problems != ["ok"]:
+            return [(self.filename, "; ".join(problems))]
+        try:
+            self.validator(self.export())
+        except ValueError as e:
+            return [(self.filename, f"{type(e).__name__}: {e}")]
+        return [(self.filename, None)]
+
+    def fetch(self, kind, uid):
+        with self._lock:
+            row = self._db.execute(SELECT[kind] + " WHERE uid=?", (uid,)).fetchone()
+        return None if row is None else DATA[kind](row)
+
+    def save(self, data):
+        metrics.bytes_written.inc(len(data), kind="snapshot")
+        data = json.loads(data)
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ("settings", "participants", "events", "reservations"):
+                    db.execute(f"DELETE FROM {table}")
+                for key, value in data.items():
+                    if key not in COLLECTIONS.values():
+                        db.execute("INSERT INTO settings VALUES (?, ?)", (key, json.dumps(value)))
+                for kind, collection in COLLECTIONS.items():
+                    db.executemany(UPSERT[kind], (ROWS[kind](item) for item in data[collection]))
+                db.execute("INSERT INTO changes (worker, record) VALUES (?, ?)", (self.worker, json.dumps({"op": "reset"})))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        self._logger.info(f"saved full snapshot to {self.filename}")
+
+    def needs_snapshot(self):
+        return False
+
+    def begin_snapshot(self):
+        pass
+
+    def append(self, record):
+        with self._lock:
+            db = self._db
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                conflicts = []
+                self._apply(db, record, conflicts)
+                if conflicts:
+                    raise ConflictError(f"{len(conflicts)} conflicting writes", conflicts)
+                line = json.dumps(record, separators=(",", ":"))
+                seq = db.execute("INSERT INTO changes (worker, record) VALUES (?, ?)", (self.worker, line)).lastrowid
+                if seq % 1000 == 0:
+                    db.execute("DELETE FROM changes WHERE seq <= ?", (seq - CHANGES_KEEP,))
+                db.execute("COMMIT")
+                metrics.bytes_written.inc(len(line), kind="journal")
+            except sqlite3.IntegrityError as e:
+                db.execute("ROLLBACK")
+                raise ConflictError(str(e)) from e
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def _update(self, db, record, conflicts, sql, params):
+        if "version" not in record:
+            db.execute(f"{sql} WHERE uid=?", (*params, record["uid"]))
+            return
+        cursor = db.execute(f"{sql}, version=version+1 WHERE uid=? AND version=?", (*params, record["uid"], record["version"]))
+        if cursor.rowcount == 0 and db.execute(f"SELECT 1 FROM {COLLECTIONS[record['kind']]} WHERE uid=?", (record["uid"],)).fetchone() is not None:
+            conflicts.append(record)
+
+    def _apply(self, db, record, conflicts):
+        op = record["op"]
+        if op == "set" and record["uid"] is None:
+            db.execute("INSERT INTO settings VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (record["field"], json.dumps(record["value"])))
+        elif op == "set":
+            kind, field, value = record["kind"], record["field"], record["value"]
+            if field == "counter_internal":
+                self._update(db, record, conflicts, "UPDATE reservations SET count=?, count_max=?, showed=?", (value["count"], value["count_max"], value["showed"]))
+            elif field in UPDATABLE[kind]:
+                if field == "names":
+                    value = json.dumps(value)
+                elif field == "add_default":
+                    value = int(value)
+                self._update(db, record, conflicts, f"UPDATE {COLLECTIONS[kind]} SET {field}=?", (value,))
+            else:
+                raise ValueError(f"cannot store field {field} of {kind}")
+        elif op in ("add_participant", "add_event", "add_reservation"):
+            kind = op.removeprefix("add_")
+            db.execute(UPSERT[kind], ROWS[kind](record["data"]))
+        elif op == "remove_event":
+            db.execute("DELETE FROM reservations WHERE event_uid=?", (record["uid"],))
+            db.execute("DELETE FROM events WHERE uid=?", (record["uid"],))
+        elif op == "remove_participants":
+            db.executemany("DELETE FROM participants WHERE uid=?", ((uid,) for uid in record["uids"]))
+        elif op == "batch":
+            for batch_record in record["records"]:
+                self._apply(db, batch_record, conflicts)
+        else:
+            raise ValueError(f"unknown journal operation {op}")
+
+    def changes_since(self):
+        with self._lock:
+            db = self._db
+            first = db.execute("SELECT min(seq) FROM changes").fetchone()[0]
+            if first is not None and first > self.seq + 1:
+                raise ResyncRequired(f"changes after {self.seq} were pruned")
+            rows = db.execute("SELECT seq, worker, record FROM changes WHERE seq > ? ORDER BY seq", (self.seq,)).fetchall()
+        records = []
+        for seq, worker, record in rows:
+            self.seq = seq
+            record = json.loads(record)
+            if record["op"] == "reset":
+                raise ResyncRequired("the data was replaced")
+            if worker != self.worker:
+                records.append(record)
+        return records
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,108 @@
+import bisect
+import datetime
+import math
+from array import array
+
+FIELDS = ("total", "expected", "cancelled", "shows", "noshows")
+PERIODS = ("event", "week", "month", "year")
+
+def period_start(date: datetime.date, period: str) -> datetime.date:
+    if period == "event":
+        return date
+    elif period == "week":
+        return date - datetime.timedelta(days=date.weekday())
+    elif period == "month":
+        return date.replace(day=1)
+    elif period == "year":
+        return date.replace(month=1, day=1)
+    else:
+        raise ValueError(f"unknown period {period}")
+
+def next_period(start: datetime.date, period: str) -> datetime.date:
+    if period == "week":
+        return start + datetime.timedelta(weeks=1)
+    elif period == "month":
+        return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    elif period == "year":
+        return start.replace(year=start.year + 1)
+    else:
+        return start + datetime.timedelta(days=1)
+
+def downsample(labels: list, data: dict[str, list], max_points: int) -> tuple[list, dict[str, list]]:
+    if len(labels) <= max_points:
+        return labels, data
+    size = math.ceil(len(labels) / max_points)
+    averaged = {f: [round(sum(values[i:i + size]) / len(values[i:i + size]), 1) for i in range(0, len(values), size)] for f, values in data.items()}
+    return labels[::size], averaged
+
+
+class StatisticsSeries:
+    def __init__(self, fields=FIELDS):
+        self.fields = fields
+        self._days = array("l")
+        self._columns = {f: array("l") for f in fields}
+
+    def __len__(self):
+        return len(self._days)
+
+    def clear(self):
+        del self._days[:]
+        for column in self._columns.values():
+            del column[:]
+
+    def _find(self, date: datetime.date) -> int:
+        day = date.toordinal()
+        i = bisect.bisect_left(self._days, day)
+        if i == len(self._days) or self._days[i] != day:
+            raise KeyError(date)
+        return i
+
+    def set(self, date: datetime.date, statistics: dict):
+        day = date.toordinal()
+        i = bisect.bisect_left(self._days, day)
+        if i == len(self._days) or self._days[i] != day:
+            self._days.insert(i, day)
+            for f, column in self._columns.items():
+                column.insert(i, statistics[f])
+        else:
+            for f, column in self._columns.items():
+                column[i] = statistics[f]
+
+    def add(self, date: datetime.date, delta: dict):
+        i = self._find(date)
+        for f, column in self._columns.items():
+            column[i] += delta[f]
+
+    def remove(self, date: datetime.date):
+        i = self._find(date)
+        del self._days[i]
+        for column in self._columns.values():
+            del column[i]
+
+    def _bounds(self, start: datetime.date | None = None, end: datetime.date | None = None) -> tuple[int, int]:
+        lo = 0 if start is None else bisect.bisect_left(self._days, start.toordinal())
+        hi = len(self._days) if end is None else bisect.bisect_right(self._days, end.toordinal())
+        return lo, max(lo, hi)
+
+    def dates(self, start: datetime.date | None = None, end: datetime.date | None = None) -> list[datetime.date]:
+        lo, hi = self._bounds(start, end)
+        return [datetime.date.fromordinal(day) for day in self._days[lo:hi]]
+
+    def totals(self, fields, start: datetime.date | None = None, end: datetime.date | None = None) -> dict[str, int]:
+        lo, hi = self._bounds(start, end)
+        return {f: sum(self._columns[f][lo:hi]) for f in fields}
+
+    def rollup(self, fields, period: str = "event", start: datetime.date | None = None, end: datetime.date | None = None) -> tuple[list[datetime.date], dict[str, list[int]]]:
+        lo, hi = self._bounds(start, end)
+        if period == "event":
+            return self.dates(start, end), {f: self._columns[f][lo:hi].tolist() for f in fields}
+        labels = []
+        bounds = []
+        i = lo
+        while i < hi:
+            bucket = period_start(datetime.date.fromordinal(self._days[i]), period)
+            j = bisect.bisect_left(self._days, next_period(bucket, period).toordinal(), i, hi)
+            labels.append(bucket)
+            bounds.append((i, j))
+            i = j
+        return labels, {f: [sum(self._columns[f][i:j]) for i, j in bounds] for f in fields}